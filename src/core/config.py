@@ -30,6 +30,21 @@ class Settings(BaseSettings):
     JWT_SECRET_KEY: str = secrets.token_urlsafe(32)
     JWT_REFRESH_SECRET_KEY: str = secrets.token_urlsafe(32)
 
+    PRODUCT_CATALOG_CACHE_SIZE: int = 4096
+    PRODUCT_CATALOG_CACHE_TTL_SECONDS: int = 60
+    USER_PRINCIPAL_CACHE_SIZE: int = 1024
+    USER_PRINCIPAL_CACHE_TTL_SECONDS: int = 30
+
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASHING_WORKERS: int = 4
+
+    REBUILD_CONFLICTING_INDEXES: bool = False
+
+    IMPORT_BATCH_SIZE: int = 500
+    IMPORT_JOB_TTL_SECONDS: int = 60 * 60 * 24 * 7  # 7 days
+    IMPORT_PROCESS_WORKERS: Optional[int] = None  # None uses every CPU
+    IMPORT_VALIDATION_CHUNK_SIZE: int = 1000
+
     FIRST_SUPERUSER_USERNAME: str
     FIRST_SUPERUSER_PASSWORD: str
     FIRST_SUPERUSER_EMAIL: str
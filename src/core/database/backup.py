@@ -1,11 +1,13 @@
 import datetime
 import uuid
 import json
-from typing import Dict, List, Any
+from typing import Dict, List, Any, TextIO
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from motor.motor_asyncio import AsyncIOMotorClient
 
 from src.core.config import settings
+from src.core.database.base_crud import ITER_BATCH_SIZE
+from src.core.database.codecs import type_registry
 
 
 class BackupEncoder(json.JSONEncoder):
@@ -36,6 +38,9 @@ async def get_database_session() -> AsyncIOMotorClient:
     client = AsyncIOMotorClient(
         str(settings.MONGO_DATABASE_URI),
         uuidRepresentation='standard',
+        type_registry=type_registry,
+        tz_aware=True,
+        tzinfo=datetime.timezone.utc,
     )
     db = client.get_database(settings.MONGO_DB)
     return db
@@ -50,10 +55,18 @@ async def populate_from_json(db: AsyncIOMotorDatabase, data: Dict[str, List[Dict
             await db[collection].insert_many(collection_data)
 
 
-async def dump_to_json(db: AsyncIOMotorDatabase) -> Dict[str, Any]:
-    json_data = {}
+async def dump_to_json(db: AsyncIOMotorDatabase, file: TextIO, batch_size: int = ITER_BATCH_SIZE) -> None:
+    # Se escribe documento a documento para no cargar las colecciones en memoria
+    encoder = BackupEncoder()
     collections = await db.list_collection_names()
-    for collection in collections:
-        documents = await db[collection].find().to_list(None)
-        json_data[collection] = documents
-    return json_data
+    file.write('{')
+    for i, collection in enumerate(collections):
+        file.write(',' if i > 0 else '')
+        file.write(f'\n    {encoder.encode(collection)}: [')
+        j = 0
+        async for document in db[collection].find(batch_size=batch_size):
+            file.write(',' if j > 0 else '')
+            file.write(f'\n        {encoder.encode(document)}')
+            j += 1
+        file.write('\n    ]' if j > 0 else ']')
+    file.write('\n}\n')
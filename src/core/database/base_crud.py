@@ -1,10 +1,13 @@
-from typing import Any, Self, Literal
+import asyncio
+from typing import Any, AsyncIterator, ClassVar, Self, Literal
 from enum import StrEnum
 from uuid import uuid4
 
 from pydantic import BaseModel
-from motor.motor_asyncio import AsyncIOMotorDatabase, AsyncIOMotorCollection
+from motor.motor_asyncio import AsyncIOMotorDatabase, AsyncIOMotorCollection, AsyncIOMotorCursor
 from pymongo import (
+    ASCENDING,
+    IndexModel,
     InsertOne,
     DeleteMany,
     DeleteOne,
@@ -20,7 +23,11 @@ from src.core.database.mongo_types import (
     InsertResultMongo,
     BulkWriteResult,
 )
-from src.core.utils.helpers import check_all_keys, change_invalid_types_mongo
+from src.core.database.pagination import decode_cursor, encode_cursor, keyset_query
+from src.core.database.projection import PartialDocument, partial_model, projection
+from src.core.database.query import translate_query
+
+ITER_BATCH_SIZE = 500
 
 
 class BulkTypes(StrEnum):
@@ -85,24 +92,28 @@ class BulkOperation():
 
 
 class BaseMongo(BaseModel):
+    # Índices de la colección, se sincronizan al arrancar la aplicación
+    __indexes__: ClassVar[list[IndexModel]] = []
+    # Orden estable usado por la paginación con cursor, debe acabar en _id
+    __cursor_sort__: ClassVar[list[tuple[str, int]]] = [('_id', ASCENDING)]
 
     @classmethod
     def _get_collection_name(cls):
         return cls.__name__
 
     @staticmethod
-    def prepare_query(query: dict):
-        if check_all_keys(query, 'id'):
-            query['_id'] = query.pop('id')
-        return query
+    def prepare_query(query: dict) -> dict:
+        return translate_query(query)
 
     @classmethod
     async def get(
         cls: Self,
         db: AsyncIOMotorDatabase,
         query: dict,
+        fields: tuple[str, ...] | None = None,
+        construct: bool = False,
         **kwargs: Any,
-    ) -> Self | None:
+    ) -> Self | PartialDocument | None:
         """
         Retrieves a single document from the database based on the provided query.
 
@@ -113,22 +124,28 @@ class BaseMongo(BaseModel):
         Parameters:
         - db (AsyncIOMotorDatabase): The database instance to perform the operation on.
         - query (dict): The query criteria to search for a document.
+        - fields (tuple[str, ...], optional): The only fields to fetch, returned in a partial model.
+        - construct (bool): Whether to build the model without validating the stored document.
         - **kwargs (Any): Additional keyword arguments to be passed to the find_one operation.
 
         Returns:
-        - Self | None: An instance of the class representing the retrieved document, or None if not found.
+        - Self | PartialDocument | None: An instance of the class representing the retrieved document,
+          or None if not found.
         """
         collection: AsyncIOMotorCollection = db[cls._get_collection_name()]
+        if fields is not None:
+            kwargs['projection'] = projection(fields)
         result = await collection.find_one(cls.prepare_query(query), **kwargs)
-        return cls.from_mongo(result)
+        return cls.from_mongo(result, fields, construct)
 
     @classmethod
     async def get_multi(
         cls: Self,
         db: AsyncIOMotorDatabase,
         query: dict | None = None,
+        fields: tuple[str, ...] | None = None,
         **kwargs: Any,
-    ) -> list[Self]:
+    ) -> list[Self | PartialDocument]:
         """
         Retrieves a multiple documents from the database based on the provided query.
 
@@ -138,10 +155,11 @@ class BaseMongo(BaseModel):
         Parameters:
         - db (AsyncIOMotorDatabase): The MongoDB database to query.
         - query (dict, optional): The query to filter the documents. Defaults to None.
+        - fields (tuple[str, ...], optional): The only fields to fetch, returned in partial models.
         - **kwargs (Any): Additional keyword arguments that can be passed to the MongoDB query.
 
         Returns:
-        list[Self]: A list of instances of the class representing the retrieved documents.
+        list[Self | PartialDocument]: A list of instances of the class representing the retrieved documents.
 
         Note:
         - If no query is provided, an empty query is used to retrieve all documents.
@@ -149,9 +167,167 @@ class BaseMongo(BaseModel):
         if query is None:
             query = {}
         collection: AsyncIOMotorCollection = db[cls._get_collection_name()]
+        if fields is not None:
+            kwargs['projection'] = projection(fields)
         cursor = collection.find(cls.prepare_query(query), **kwargs)
         result = await cursor.to_list(length=None)
-        return [cls.from_mongo(document) for document in result]
+        return [cls.from_mongo(document, fields) for document in result]
+
+    @classmethod
+    async def iter(
+        cls: Self,
+        db: AsyncIOMotorDatabase,
+        query: dict | None = None,
+        batch_size: int = ITER_BATCH_SIZE,
+        fields: tuple[str, ...] | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[Self | PartialDocument]:
+        """
+        Iterates over the documents matching the query without loading all of them.
+
+        The cursor fetches `batch_size` documents per round trip and each one is
+        validated as it is yielded, so only one batch is held in memory.
+
+        Parameters:
+        - db (AsyncIOMotorDatabase): The MongoDB database to query.
+        - query (dict, optional): The query to filter the documents. Defaults to None.
+        - batch_size (int): The number of documents fetched per round trip.
+        - fields (tuple[str, ...], optional): The only fields to fetch, returned in partial models.
+        - **kwargs (Any): Additional keyword arguments that can be passed to the MongoDB query.
+
+        Returns:
+        AsyncIterator[Self | PartialDocument]: The retrieved documents.
+        """
+        if query is None:
+            query = {}
+        collection: AsyncIOMotorCollection = db[cls._get_collection_name()]
+        if fields is not None:
+            kwargs['projection'] = projection(fields)
+        cursor = collection.find(cls.prepare_query(query), batch_size=batch_size, **kwargs)
+        async for document in cursor:
+            yield cls.from_mongo(document, fields)
+
+    @classmethod
+    async def get_page(
+        cls: Self,
+        db: AsyncIOMotorDatabase,
+        query: dict | None = None,
+        limit: int = 100,
+        skip: int = 0,
+        estimated_count: bool = False,
+        cursor: str | None = None,
+        fields: tuple[str, ...] | None = None,
+        construct: bool = False,
+        **kwargs: Any,
+    ) -> tuple[list[Self | PartialDocument], int, str | None]:
+        """
+        Retrieves a page of documents and the number of documents matching the query.
+
+        The page and the count are requested concurrently. With estimated_count the
+        count comes from the collection metadata instead of scanning the matching
+        documents, which is only possible when the query has no filters; filtered
+        queries are always counted exactly.
+
+        When a cursor is given (an empty string for the first page) the documents are
+        sorted by the class __cursor_sort__ keys and the page starts right after the
+        cursor instead of skipping documents, so every page costs the same.
+
+        Parameters:
+        - db (AsyncIOMotorDatabase): The MongoDB database to query.
+        - query (dict, optional): The query to filter the documents. Defaults to None.
+        - limit (int): The maximum number of documents to return.
+        - skip (int): The number of matching documents to skip, ignored with a cursor.
+        - estimated_count (bool): Whether an unfiltered count may be estimated.
+        - cursor (str, optional): The next_cursor of the previous page.
+        - fields (tuple[str, ...], optional): The only fields to fetch, returned in partial models.
+        - construct (bool): Whether to build the models without validating the stored documents.
+        - **kwargs (Any): Additional keyword arguments that can be passed to the MongoDB query.
+
+        Returns:
+        tuple[list[Self | PartialDocument], int, str | None]: The documents of the page, the total number
+        of matching documents and the cursor of the next page, if there is one.
+        """
+        if query is None:
+            query = {}
+        collection: AsyncIOMotorCollection = db[cls._get_collection_name()]
+        query = cls.prepare_query(query)
+        # El cursor se valida antes de crear la corrutina del conteo, que si no
+        # quedaría sin esperar
+        find = cls._find_page(collection, query, limit, skip, cursor, fields, **kwargs)
+        if estimated_count and len(query) == 0:
+            count = collection.estimated_document_count()
+        else:
+            count = collection.count_documents(query)
+        documents, total = await asyncio.gather(find.to_list(length=None), count)
+        next_cursor = None
+        if cursor is not None and limit > 0 and len(documents) == limit:
+            next_cursor = encode_cursor(documents[-1], cls.__cursor_sort__)
+        return [cls.from_mongo(document, fields, construct) for document in documents], total, next_cursor
+
+    @classmethod
+    async def iter_page(
+        cls: Self,
+        db: AsyncIOMotorDatabase,
+        query: dict | None = None,
+        limit: int = 100,
+        skip: int = 0,
+        cursor: str | None = None,
+        fields: tuple[str, ...] | None = None,
+        batch_size: int = ITER_BATCH_SIZE,
+        construct: bool = False,
+        **kwargs: Any,
+    ) -> AsyncIterator[Self | PartialDocument]:
+        """
+        Iterates over the same documents get_page would return, without counting them
+        and without loading the whole page.
+
+        Parameters:
+        - db (AsyncIOMotorDatabase): The MongoDB database to query.
+        - query (dict, optional): The query to filter the documents. Defaults to None.
+        - limit (int): The maximum number of documents to return.
+        - skip (int): The number of matching documents to skip, ignored with a cursor.
+        - cursor (str, optional): The next_cursor of the previous page.
+        - fields (tuple[str, ...], optional): The only fields to fetch, returned in partial models.
+        - batch_size (int): The number of documents fetched per round trip.
+        - construct (bool): Whether to build the models without validating the stored documents.
+        - **kwargs (Any): Additional keyword arguments that can be passed to the MongoDB query.
+
+        Returns:
+        AsyncIterator[Self | PartialDocument]: The documents of the page.
+        """
+        if query is None:
+            query = {}
+        collection: AsyncIOMotorCollection = db[cls._get_collection_name()]
+        query = cls.prepare_query(query)
+        find = cls._find_page(
+            collection, query, limit, skip, cursor, fields, batch_size=batch_size, **kwargs
+        )
+        async for document in find:
+            yield cls.from_mongo(document, fields, construct)
+
+    @classmethod
+    def _find_page(
+        cls: Self,
+        collection: AsyncIOMotorCollection,
+        query: dict,
+        limit: int,
+        skip: int,
+        cursor: str | None,
+        fields: tuple[str, ...] | None,
+        **kwargs: Any,
+    ) -> AsyncIOMotorCursor:
+        if fields is not None:
+            kwargs['projection'] = projection(
+                fields + tuple(key for key, _ in cls.__cursor_sort__ if key != '_id')
+            )
+        if cursor is None:
+            return collection.find(query, limit=limit, skip=skip, **kwargs)
+        sort = cls.__cursor_sort__
+        page_query = query
+        if cursor != '':
+            after = keyset_query(sort, decode_cursor(cursor, sort))
+            page_query = {'$and': [query, after]} if len(query) > 0 else after
+        return collection.find(page_query, limit=limit, sort=sort, **kwargs)
 
     @classmethod
     async def create(
@@ -239,7 +415,6 @@ class BaseMongo(BaseModel):
             data_to_update.pop('id')
         if '_id' in data_to_update:
             data_to_update.pop('_id')
-        change_invalid_types_mongo(data_to_update)
         update = {'$set': data_to_update}
         result = await collection.find_one_and_update(
             cls.prepare_query(query),
@@ -262,7 +437,6 @@ class BaseMongo(BaseModel):
             data_to_update.pop('id')
         if '_id' in data_to_update:
             data_to_update.pop('_id')
-        change_invalid_types_mongo(data_to_update)
         update = {'$set': data_to_update}
         result = await collection.update_many(
             cls.prepare_query(query),
@@ -313,6 +487,28 @@ class BaseMongo(BaseModel):
         result = await collection.count_documents(cls.prepare_query(query), **kwargs)
         return result
 
+    @classmethod
+    async def aggregate(
+        cls: Self,
+        db: AsyncIOMotorDatabase,
+        pipeline: list[dict],
+        **kwargs: Any,
+    ) -> list[dict]:
+        """
+        Runs an aggregation pipeline on the collection associated with the class.
+
+        Parameters:
+        - db (AsyncIOMotorDatabase): The MongoDB database to query.
+        - pipeline (list[dict]): The aggregation stages to run.
+        - **kwargs (Any): Additional keyword arguments to be passed to the aggregate operation.
+
+        Returns:
+        list[dict]: The raw documents produced by the pipeline.
+        """
+        collection: AsyncIOMotorCollection = db[cls._get_collection_name()]
+        cursor = collection.aggregate(pipeline, **kwargs)
+        return await cursor.to_list(length=None)
+
     @classmethod
     def get_collection(
             cls: Self,
@@ -332,10 +528,22 @@ class BaseMongo(BaseModel):
         return result
 
     @classmethod
-    def from_mongo(cls: Self, data: dict | None):
+    def from_mongo(
+        cls: Self,
+        data: dict | None,
+        fields: tuple[str, ...] | None = None,
+        construct: bool = False
+    ):
         if not data:
             return data
         data_id = data.pop('_id', None)
+        if fields is not None:
+            data = {key: value for key, value in data.items() if key in fields}
+            return partial_model(cls, fields)(**dict(data, id=data_id))
+        if construct:
+            # Los documentos guardados ya se validaron al escribirse: se conservan
+            # tal cual vienen de la base de datos, sin convertir los anidados
+            return cls.model_construct(**dict(data, id=data_id))
         return cls(**dict(data, id=data_id))
 
     def mongo(self, **kwargs):
@@ -348,5 +556,4 @@ class BaseMongo(BaseModel):
         )
         if '_id' not in parsed and 'id' in parsed:
             parsed['_id'] = parsed.pop('id')
-        change_invalid_types_mongo(parsed)
         return parsed
@@ -0,0 +1,166 @@
+from datetime import date, datetime, timezone
+from enum import Enum
+from typing import Annotated, Any, get_args, get_origin
+
+from bson.codec_options import TypeRegistry
+from pydantic import BaseModel, SerializerFunctionWrapHandler, WrapSerializer
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from src.core.database.base_crud import BaseMongo
+
+
+def fallback_encoder(value: Any) -> Any:
+    """
+    Encodes the values BSON does not support, wherever they are in the document
+    or query, lists included.
+
+    Dates are stored as ISO strings, so they can still be compared as text.
+    Datetimes never get here: BSON stores them natively as UTC dates.
+
+    Parameters:
+    - value (Any): The value BSON could not encode.
+
+    Returns:
+    Any: The value to store instead.
+    """
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+type_registry = TypeRegistry(fallback_encoder=fallback_encoder)
+
+
+def _serialize_naive_utc(value: datetime, handler: SerializerFunctionWrapHandler) -> Any:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return handler(value)
+
+
+# Los clientes de MongoDB devuelven fechas con zona UTC; la API las sigue
+# enviando sin zona, en UTC, como antes de activar tz_aware
+NaiveUTCDatetime = Annotated[datetime, WrapSerializer(_serialize_naive_utc, when_used='json')]
+
+
+def _candidates(annotation: Any) -> list[Any]:
+    # El tipo y, en las uniones como Optional, cada una de sus opciones
+    candidates = [annotation] + list(get_args(annotation))
+    return [
+        get_args(c)[0] if get_origin(c) is Annotated else c
+        for c in candidates
+    ]
+
+
+def _is_datetime(annotation: Any) -> bool:
+    return datetime in _candidates(annotation)
+
+
+def _nested_model(annotation: Any) -> type[BaseModel] | None:
+    for candidate in _candidates(annotation):
+        if isinstance(candidate, type) and issubclass(candidate, BaseModel):
+            return candidate
+    return None
+
+
+def _list_item_model(annotation: Any) -> type[BaseModel] | None:
+    for candidate in _candidates(annotation):
+        if get_origin(candidate) is list:
+            return _nested_model(get_args(candidate)[0])
+    return None
+
+
+def datetime_paths(model: type[BaseModel], prefix: str = '') -> list[str]:
+    """
+    Returns the dotted paths of the datetime fields of a model, including the
+    ones of its embedded models and of the models inside its lists.
+    """
+    paths = []
+    for name, field in model.model_fields.items():
+        path = f'{prefix}{name}'
+        nested = _nested_model(field.annotation) or _list_item_model(field.annotation)
+        if _is_datetime(field.annotation):
+            paths.append(path)
+        elif nested is not None:
+            paths += datetime_paths(nested, f'{path}.')
+    return paths
+
+
+def _datetime_overrides(model: type[BaseModel], value: str, depth: int = 0) -> dict[str, Any]:
+    # Expresiones de agregación que convierten las fechas en texto del documento
+    # en `value`; los campos que no existen se quedan sin añadir
+    overrides = {}
+    for name, field in model.model_fields.items():
+        inner = f'${name}' if value == '$' else f'{value}.{name}'
+        item_model = _list_item_model(field.annotation)
+        nested = _nested_model(field.annotation)
+        if _is_datetime(field.annotation):
+            overrides[name] = {
+                '$cond': [
+                    {'$eq': [{'$type': inner}, 'string']},
+                    {'$dateFromString': {'dateString': inner, 'onError': inner}},
+                    inner
+                ]
+            }
+        elif item_model is not None:
+            item = f'item{depth}'
+            item_overrides = _datetime_overrides(item_model, f'$${item}', depth + 1)
+            if len(item_overrides) > 0:
+                overrides[name] = {
+                    '$cond': [
+                        {'$isArray': inner},
+                        {
+                            '$map': {
+                                'input': inner,
+                                'as': item,
+                                'in': {'$mergeObjects': [f'$${item}', item_overrides]}
+                            }
+                        },
+                        inner
+                    ]
+                }
+        elif nested is not None:
+            nested_overrides = _datetime_overrides(nested, inner, depth)
+            if len(nested_overrides) > 0:
+                overrides[name] = {
+                    '$cond': [
+                        {'$eq': [{'$type': inner}, 'object']},
+                        {'$mergeObjects': [inner, nested_overrides]},
+                        inner
+                    ]
+                }
+    return overrides
+
+
+async def migrate_string_datetimes(
+    db: AsyncIOMotorDatabase,
+    models: list[type[BaseMongo]]
+) -> dict[str, int]:
+    """
+    Converts the datetimes stored as ISO strings, as they were written before the
+    codec was in place, to BSON dates.
+
+    The datetimes of the embedded documents and of the documents inside arrays
+    are migrated too. Strings that are not valid dates are left as they are.
+
+    Parameters:
+    - db (AsyncIOMotorDatabase): The database to migrate.
+    - models (list[type[BaseMongo]]): The models whose collections are migrated.
+
+    Returns:
+    dict[str, int]: The number of migrated documents by collection, only for
+    the collections where something was migrated.
+    """
+    migrated: dict[str, int] = {}
+    for model in models:
+        paths = datetime_paths(model)
+        if len(paths) == 0:
+            continue
+        result = await model.get_collection(db).update_many(
+            {'$or': [{path: {'$type': 'string'}} for path in paths]},
+            [{'$set': _datetime_overrides(model, '$')}]
+        )
+        if result.modified_count > 0:
+            migrated[model._get_collection_name()] = result.modified_count
+    return migrated
@@ -0,0 +1,28 @@
+from typing import Any, Iterable
+
+
+def compile_filters(filters: Iterable[tuple[str, Any]]) -> dict:
+    """
+    Builds a MongoDB query from (field, value) filter tuples in a single pass.
+
+    Filters whose value is None are skipped. When a field appears more than once
+    and both values are operator documents they are merged, so a date window can
+    be expressed as two filters, one with '$lte' and one with '$gte'. Otherwise
+    the last value for the field wins.
+
+    Parameters:
+    - filters (Iterable[tuple[str, Any]]): The filters to combine.
+
+    Returns:
+    dict: The query matching every non-null filter.
+    """
+    query = {}
+    for field, value in filters:
+        if value is None:
+            continue
+        previous = query.get(field)
+        if isinstance(previous, dict) and isinstance(value, dict):
+            query[field] = {**previous, **value}
+        else:
+            query[field] = value
+    return query
@@ -0,0 +1,109 @@
+import logging
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure
+
+from src.core.database.base_crud import BaseMongo
+
+# Códigos de MongoDB cuando ya existe un índice con el mismo nombre o las
+# mismas claves pero con otras opciones
+INDEX_CONFLICT_CODES = (85, 86)
+
+logger = logging.getLogger(__name__)
+
+
+async def sync_indexes(
+    db: AsyncIOMotorDatabase,
+    models: list[type[BaseMongo]],
+    rebuild: bool = False,
+) -> dict[str, list[str]]:
+    """
+    Creates the indexes declared in the `__indexes__` attribute of the models.
+
+    Indexes that already exist with the same specification are left untouched,
+    so the sync can run on every startup. An index whose options changed is
+    reported as 'conflicting' and kept as it is, unless `rebuild` is set, in
+    which case it is dropped and created again. A failure on one index (for
+    example, a unique index over duplicated data) is reported and does not stop
+    the others.
+
+    Parameters:
+    - db (AsyncIOMotorDatabase): The database where the collections live.
+    - models (list[type[BaseMongo]]): The models whose indexes are synced.
+    - rebuild (bool): Whether to rebuild the indexes whose options changed.
+
+    Returns:
+    dict[str, list[str]]: The names of the indexes that were 'created',
+    'unchanged', 'conflicting', 'rebuilt' or 'failed', prefixed by their
+    collection.
+    """
+    report = {'created': [], 'unchanged': [], 'conflicting': [], 'rebuilt': [], 'failed': []}
+    for model in models:
+        collection = model.get_collection(db)
+        existing = await collection.index_information()
+        for index in model.__indexes__:
+            name = index.document['name']
+            full_name = f'{model._get_collection_name()}.{name}'
+            try:
+                await collection.create_indexes([index])
+                report['unchanged' if name in existing else 'created'].append(full_name)
+            except OperationFailure as e:
+                if e.code not in INDEX_CONFLICT_CODES:
+                    report['failed'].append(f'{full_name}: {e.details.get("errmsg", e)}')
+                    continue
+                if not rebuild:
+                    report['conflicting'].append(full_name)
+                    continue
+                try:
+                    await rebuild_index(db, model, index)
+                    report['rebuilt'].append(full_name)
+                except OperationFailure as rebuild_error:
+                    report['failed'].append(
+                        f'{full_name}: {rebuild_error.details.get("errmsg", rebuild_error)}'
+                    )
+    for state, indexes in report.items():
+        if len(indexes) > 0:
+            level = logging.WARNING if state in ('conflicting', 'failed') else logging.INFO
+            logger.log(level, 'Indexes %s: %s', state, ', '.join(indexes))
+    return report
+
+
+async def rebuild_index(
+    db: AsyncIOMotorDatabase,
+    model: type[BaseMongo],
+    index: IndexModel,
+) -> None:
+    """
+    Replaces the indexes that conflict with `index` by it.
+
+    MongoDB does not allow two indexes with the same keys, so the conflicting
+    ones have to be dropped first. When the new index cannot be built, the
+    dropped ones are created again before raising the error.
+
+    Parameters:
+    - db (AsyncIOMotorDatabase): The database where the collection lives.
+    - model (type[BaseMongo]): The model that declares the index.
+    - index (IndexModel): The index to build.
+
+    Raises:
+    OperationFailure: When the new index cannot be built.
+    """
+    collection = model.get_collection(db)
+    keys = list(index.document['key'].items())
+    dropped = [
+        IndexModel(
+            info['key'],
+            name=name,
+            **{k: v for k, v in info.items() if k not in ('key', 'v', 'ns')}
+        )
+        for name, info in (await collection.index_information()).items()
+        if name == index.document['name'] or info['key'] == keys
+    ]
+    for old_index in dropped:
+        await collection.drop_index(old_index.document['name'])
+    try:
+        await collection.create_indexes([index])
+    except OperationFailure:
+        await collection.create_indexes(dropped)
+        raise
@@ -0,0 +1,75 @@
+import base64
+import binascii
+from typing import Any
+
+from bson import json_util
+from bson.binary import UuidRepresentation
+from bson.errors import InvalidBSON
+from fastapi import HTTPException, status
+
+CURSOR_JSON_OPTIONS = json_util.JSONOptions(
+    json_mode=json_util.JSONMode.RELAXED,
+    uuid_representation=UuidRepresentation.STANDARD,
+)
+
+
+def encode_cursor(document: dict, sort: list[tuple[str, int]]) -> str:
+    """
+    Encodes the sort key values of a document as an opaque cursor.
+
+    Parameters:
+    - document (dict): The last raw MongoDB document of a page.
+    - sort (list[tuple[str, int]]): The keys and directions the page is sorted by.
+
+    Returns:
+    str: A URL safe string that points right after the document.
+    """
+    values = [get_field(document, key) for key, _ in sort]
+    data = json_util.dumps(values, json_options=CURSOR_JSON_OPTIONS)
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def decode_cursor(cursor: str, sort: list[tuple[str, int]]) -> list[Any]:
+    try:
+        data = base64.urlsafe_b64decode(cursor.encode())
+        values = json_util.loads(data, json_options=CURSOR_JSON_OPTIONS)
+    except (binascii.Error, ValueError, InvalidBSON):
+        values = None
+    if not isinstance(values, list) or len(values) != len(sort):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='Invalid cursor'
+        )
+    return values
+
+
+def keyset_query(sort: list[tuple[str, int]], values: list[Any]) -> dict:
+    """
+    Builds the filter that matches the documents sorted after the given values.
+
+    For a sort on (date, _id) and values (d, i) it matches date > d, or
+    date == d and _id > i, so the database seeks with the index instead of
+    walking every skipped document.
+
+    Parameters:
+    - sort (list[tuple[str, int]]): The keys and directions the page is sorted by.
+    - values (list[Any]): The sort key values of the last document already returned.
+
+    Returns:
+    dict: The query selecting the following documents.
+    """
+    clauses = []
+    for i, (key, direction) in enumerate(sort):
+        clause = {sort[j][0]: values[j] for j in range(i)}
+        clause[key] = {'$gt' if direction > 0 else '$lt': values[i]}
+        clauses.append(clause)
+    return clauses[0] if len(clauses) == 1 else {'$or': clauses}
+
+
+def get_field(document: dict, key: str) -> Any:
+    value = document
+    for part in key.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
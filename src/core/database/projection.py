@@ -0,0 +1,70 @@
+from functools import lru_cache
+from typing import Optional
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel, ConfigDict, UUID4, create_model
+
+
+class PartialDocument(BaseModel):
+    """
+    Base of the models built for a projection. Only the requested fields are
+    declared; the id is always returned.
+    """
+    model_config = ConfigDict(extra='allow')
+
+    id: UUID4
+
+
+@lru_cache(maxsize=256)
+def partial_model(model: type[BaseModel], fields: tuple[str, ...]) -> type[PartialDocument]:
+    """
+    Builds (once per model and set of fields) a model holding only the given
+    fields of another model, all of them optional.
+
+    Parameters:
+    - model (type[BaseModel]): The model the fields belong to.
+    - fields (tuple[str, ...]): The names of the fields to keep.
+
+    Returns:
+    type[PartialDocument]: The partial model.
+    """
+    definitions = {
+        field: (Optional[model.model_fields[field].annotation], None)
+        for field in fields if field != 'id'
+    }
+    return create_model(
+        f'{model.__name__}Partial',
+        __base__=PartialDocument,
+        **definitions
+    )
+
+
+def parse_fields(model: type[BaseModel], fields: str | None) -> tuple[str, ...] | None:
+    """
+    Parses the comma separated `fields` query parameter of a list endpoint.
+
+    Parameters:
+    - model (type[BaseModel]): The model whose fields can be requested.
+    - fields (str | None): The requested fields, e.g. "name,phone".
+
+    Returns:
+    tuple[str, ...] | None: The requested fields plus the id, in the order the
+    model declares them, or None when every field is requested.
+    """
+    if fields is None:
+        return None
+    requested = {field.strip() for field in fields.split(',') if field.strip() != ''}
+    unknown = requested - set(model.model_fields)
+    if len(unknown) > 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'Unknown fields: {", ".join(sorted(unknown))}'
+        )
+    requested.add('id')
+    return tuple(field for field in model.model_fields if field in requested)
+
+
+def projection(fields: tuple[str, ...]) -> dict:
+    result = {field: 1 for field in fields if field != 'id'}
+    result['_id'] = 1
+    return result
@@ -0,0 +1,43 @@
+from functools import lru_cache
+
+LOGICAL_OPERATORS = frozenset(('$and', '$or', '$nor'))
+
+
+@lru_cache(maxsize=1024)
+def compile_shape(keys: tuple[str, ...]) -> tuple[tuple[str, ...], bool, bool]:
+    """
+    Compiles the keys of a query level, once per distinct set of keys.
+
+    Parameters:
+    - keys (tuple[str, ...]): The keys of the query, in order.
+
+    Returns:
+    tuple[tuple[str, ...], bool, bool]: The keys with `id` renamed to `_id`,
+    whether any key was renamed and whether any key is a logical operator.
+    """
+    renamed = tuple('_id' if key == 'id' else key for key in keys)
+    return renamed, renamed != keys, any(key in LOGICAL_OPERATORS for key in keys)
+
+
+def translate_query(query: dict) -> dict:
+    """
+    Translates the `id` of the models to the `_id` of MongoDB.
+
+    Only the keys of the query itself and of the clauses of $and, $or and $nor
+    refer to the document id; an `id` inside a field condition or an embedded
+    document (e.g. `patient.id`) is left untouched. The query is not modified,
+    a translated copy is returned when needed.
+
+    Parameters:
+    - query (dict): The query written with the model field names.
+
+    Returns:
+    dict: The query to send to MongoDB.
+    """
+    renamed, changed, logical = compile_shape(tuple(query))
+    if not changed and not logical:
+        return query
+    return {
+        key: [translate_query(clause) for clause in value] if key in LOGICAL_OPERATORS else value
+        for key, value in zip(renamed, query.values())
+    }
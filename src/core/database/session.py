@@ -1,12 +1,23 @@
 import asyncio
 import sys
+from datetime import datetime, timezone
 
-from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
+from motor.motor_asyncio import AsyncIOMotorClient
 
 from src.core.config import settings
-from src.modules.shared.auth.model import RefreshToken
+from src.core.database.base_crud import BaseMongo
+from src.core.database.codecs import migrate_string_datetimes, type_registry
+from src.core.database.indexes import sync_indexes
+from src.modules.shared.auth.model import RefreshToken, UserSecret
 from src.modules.shared.user import model
-from src.core.utils.security import get_hashed_password
+from src.modules.cyc.warehouse.model import Product, Warehouse
+from src.modules.cyc.delivery.model import Delivery
+from src.modules.cyc.family.model import Family
+from src.modules.acat.patient.model import Patient
+from src.modules.acat.intervention.model import Intervention
+from src.modules.shared.imports.model import ImportJob, ImportStatus
+from src.modules.cyc.warehouse.migration import migrate_embedded_products
+from src.core.utils.security import password_hasher
 
 if 'win' in sys.platform:
     # Set event loop policy for Windows
@@ -21,9 +32,16 @@ async def connect_and_init_db():
         _client_db = AsyncIOMotorClient(
             str(settings.MONGO_DATABASE_URI),
             uuidRepresentation='standard',
+            type_registry=type_registry,
+            tz_aware=True,
+            tzinfo=timezone.utc,
         )
+        if settings.CYC_NGO:
+            await migrate_warehouse_products(_client_db)
+        await migrate_datetimes(_client_db)
+        await create_indexes(_client_db)
         await create_superuser(_client_db)
-        await create_ttl_index(_client_db, RefreshToken, "expires_at", 0)
+        await fail_interrupted_imports(_client_db)
     except Exception as e:
         raise e
 
@@ -47,13 +65,46 @@ async def create_superuser(client: AsyncIOMotorClient) -> None:
         first_superuser = {
             'master': True,
             'username': settings.FIRST_SUPERUSER_USERNAME,
-            'password': get_hashed_password(settings.FIRST_SUPERUSER_PASSWORD),
+            'password': await password_hasher.hash(settings.FIRST_SUPERUSER_PASSWORD),
             'email': settings.FIRST_SUPERUSER_EMAIL
         }
         await model.User.create(db, first_superuser)
 
 
-async def create_ttl_index(client: AsyncIOMotorClient, collection: model, field_name: str, expire_after_seconds: int):
+def document_models() -> list[type[BaseMongo]]:
+    models = [model.User, UserSecret, RefreshToken, ImportJob]
+    if settings.CYC_NGO:
+        models += [Warehouse, Product, Delivery, Family]
+    if settings.ACAT_NGO:
+        models += [Patient, Intervention]
+    return models
+
+
+async def create_indexes(client: AsyncIOMotorClient) -> None:
+    db = client.get_database(settings.MONGO_DB)
+    await sync_indexes(db, document_models(), rebuild=settings.REBUILD_CONFLICTING_INDEXES)
+
+
+async def migrate_datetimes(client: AsyncIOMotorClient) -> None:
+    db = client.get_database(settings.MONGO_DB)
+    await migrate_string_datetimes(db, document_models())
+
+
+async def migrate_warehouse_products(client: AsyncIOMotorClient) -> None:
+    db = client.get_database(settings.MONGO_DB)
+    await migrate_embedded_products(db)
+
+
+async def fail_interrupted_imports(client: AsyncIOMotorClient) -> None:
+    # Las importaciones corren en tareas del proceso, las que quedaron a medias
+    # al parar el servidor ya no terminarán
     db = client.get_database(settings.MONGO_DB)
-    collection: AsyncIOMotorCollection = db[collection._get_collection_name()]
-    await collection.create_index([(field_name, 1)], expireAfterSeconds=expire_after_seconds)
+    await ImportJob.update_many(
+        db,
+        {'status': {'$in': [ImportStatus.PENDING, ImportStatus.RUNNING]}},
+        {
+            'status': ImportStatus.FAILED,
+            'errors': [{'row': None, 'detail': 'The server stopped before the import finished'}],
+            'finished_at': datetime.now(timezone.utc)
+        }
+    )
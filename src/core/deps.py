@@ -12,6 +12,7 @@ from src.core.database.session import get_client
 from src.core.config import settings
 from src.modules.shared.auth import model as auth_model
 from src.modules.shared.user import model as user_model
+from src.modules.shared.user.cache import user_principals
 
 
 reusable_oauth = OAuth2PasswordBearer(
@@ -29,7 +30,7 @@ DataBaseDep = Annotated[AsyncIOMotorDatabase, Depends(get_db)]
 TokenDep = Annotated[str, Depends(reusable_oauth)]
 
 
-async def get_current_user(db: DataBaseDep, token: TokenDep) -> user_model.User:
+async def get_current_user(db: DataBaseDep, token: TokenDep) -> user_model.UserPrincipal:
     try:
         payload = jwt.decode(
             token, settings.JWT_SECRET_KEY, algorithms=[settings.ALGORITHM]
@@ -52,20 +53,23 @@ async def get_current_user(db: DataBaseDep, token: TokenDep) -> user_model.User:
             headers={"WWW-Authenticate": "Bearer"},
         ) from e
 
-    user = await user_model.User.get(db, {'id': token_data.sub})
-
+    user = user_principals.get(token_data.sub)
     if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Could not find user",
-        )
+        user = await user_model.User.get(db, {'id': token_data.sub})
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Could not find user",
+            )
+        user = user_model.UserPrincipal(**user.model_dump(exclude={'password'}))
+        user_principals.set(token_data.sub, user)
 
     return user
 
 
 async def get_master_user(
-    user: Annotated[user_model.User, Depends(get_current_user)]
-) -> user_model.User:
+    user: Annotated[user_model.UserPrincipal, Depends(get_current_user)]
+) -> user_model.UserPrincipal:
     if not user.master:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
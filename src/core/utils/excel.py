@@ -0,0 +1,55 @@
+from io import BytesIO
+from typing import Any, Iterator, NamedTuple, Sequence
+
+import openpyxl
+
+from src.modules.shared.imports.model import InvalidImportRow
+
+
+class ExcelRow(NamedTuple):
+    number: int
+    values: tuple[Any, ...]
+
+
+def iter_excel_rows(
+    content: bytes,
+    columns: Sequence[str],
+    min_col: int = 1
+) -> Iterator[ExcelRow]:
+    """
+    Reads the rows of the active sheet of an Excel file one at a time.
+
+    The workbook is opened in read only mode, so the cells are parsed while they
+    are iterated and memory does not grow with the number of rows. Formulas are
+    read as their last computed value. The first row must hold the expected
+    headers; empty rows are skipped.
+
+    Parameters:
+    - content (bytes): The Excel file.
+    - columns (Sequence[str]): The headers of the columns to read.
+    - min_col (int): The column of the first header, starting at 1.
+
+    Returns:
+    Iterator[ExcelRow]: The number of each row in the sheet and its values, one
+    per column, None for the empty cells.
+
+    Raises:
+    InvalidImportRow: When the headers are not the expected ones.
+    """
+    wb = openpyxl.load_workbook(BytesIO(content), read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(
+            min_row=1,
+            min_col=min_col,
+            max_col=min_col + len(columns) - 1,
+            values_only=True
+        )
+        headers = next(rows, ())
+        if len(headers) == 0 or not all(header in columns for header in headers):
+            raise InvalidImportRow('The excel file is incorrect')
+        for number, values in enumerate(rows, start=2):
+            if all(value is None for value in values):
+                continue
+            yield ExcelRow(number, values)
+    finally:
+        wb.close()
@@ -0,0 +1,25 @@
+from fastapi import Response, status
+from pydantic import BaseModel
+
+
+def model_response(content: BaseModel, status_code: int = status.HTTP_200_OK) -> Response:
+    """
+    Serializes a model straight to JSON.
+
+    FastAPI dumps the returned model, validates the result against the
+    response_model and serializes it again. Returning the model already
+    serialized skips those passes, so it should only be used with models
+    built as the response_model of the route.
+
+    Parameters:
+    - content (BaseModel): The response body.
+    - status_code (int): The status of the response.
+
+    Returns:
+    Response: The application/json response.
+    """
+    return Response(
+        content=content.model_dump_json(by_alias=True),
+        status_code=status_code,
+        media_type='application/json'
+    )
@@ -1,7 +1,10 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 import json
 import os
-from typing import Union, Any
+import weakref
+from typing import Callable, TypeVar, Union, Any
 import bcrypt
 from jose import jwt
 from cryptography.hazmat.primitives import padding
@@ -53,7 +56,7 @@ def create_refresh_token(
 
 def get_hashed_password(password: str) -> str:
     pwd_bytes = password.encode('utf-8')
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS)
     hashed_password = bcrypt.hashpw(pwd_bytes, salt)
     return hashed_password.decode('utf-8')
 
@@ -64,6 +67,72 @@ def verify_password(password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(password_byte_enc, hashed_password_bytes)
 
 
+Result = TypeVar('Result')
+
+
+class PasswordHasher():
+    """
+    Runs bcrypt out of the event loop, on a bounded thread pool.
+
+    bcrypt releases the GIL while it hashes, so the threads do not stall the
+    other requests. At most `workers` passwords are hashed or checked at once;
+    the rest wait their turn, and how many are waiting is the queue depth
+    reported by `stats`.
+    """
+
+    def __init__(self, workers: int) -> None:
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        self._semaphores: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore] = (
+            weakref.WeakKeyDictionary()
+        )
+        self.waiting = 0
+        self.max_waiting = 0
+        self.running = 0
+        self.completed = 0
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # Un semáforo por bucle de eventos, un asyncio.Semaphore no se puede compartir entre bucles
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            self._semaphores[loop] = asyncio.Semaphore(self.workers)
+        return self._semaphores[loop]
+
+    async def _run(self, func: Callable[..., Result], *args: Any) -> Result:
+        semaphore = self._semaphore()
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            await semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self.running -= 1
+            self.completed += 1
+            semaphore.release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_hashed_password, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, password, hashed_password)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            'workers': self.workers,
+            'running': self.running,
+            'waiting': self.waiting,
+            'max_waiting': self.max_waiting,
+            'completed': self.completed
+        }
+
+
+password_hasher = PasswordHasher(settings.PASSWORD_HASHING_WORKERS)
+
+
 def generate_salt() -> bytes:
     return os.urandom(16)
 
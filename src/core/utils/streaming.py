@@ -0,0 +1,36 @@
+from enum import StrEnum
+from typing import AsyncIterator
+
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+
+class ListFormat(StrEnum):
+    JSON = 'json'
+    NDJSON = 'ndjson'
+
+
+async def ndjson_response(rows: AsyncIterator[BaseModel]) -> StreamingResponse:
+    """
+    Streams models as newline delimited JSON, one model per line, serializing
+    each one as soon as it is read from the database.
+
+    The first row is read before the response starts, so an invalid cursor or
+    a database error is still returned as a regular error response.
+
+    Parameters:
+    - rows (AsyncIterator[BaseModel]): The models to send.
+
+    Returns:
+    StreamingResponse: The application/x-ndjson response.
+    """
+    first = await anext(rows, None)
+
+    async def body() -> AsyncIterator[bytes]:
+        if first is None:
+            return
+        yield first.model_dump_json().encode() + b'\n'
+        async for row in rows:
+            yield row.model_dump_json().encode() + b'\n'
+
+    return StreamingResponse(body(), media_type='application/x-ndjson')
@@ -4,7 +4,11 @@ import json
 
 from motor.motor_asyncio import AsyncIOMotorClient
 
+from src.core.config import settings
 from src.core.database import backup
+from src.core.database.codecs import migrate_string_datetimes
+from src.core.database.session import document_models
+from src.modules.cyc.warehouse.migration import migrate_embedded_products
 
 
 async def populate_json_data(motor: AsyncIOMotorClient, route: str):
@@ -19,6 +23,9 @@ async def populate_json_data(motor: AsyncIOMotorClient, route: str):
                     list) for value in data.values()):
                 raise ValueError("Invalid JSON data format")
             await backup.populate_from_json(motor, data)
+            await migrate_string_datetimes(motor, document_models())
+            if settings.CYC_NGO:
+                await migrate_embedded_products(motor)
     except FileNotFoundError:
         print(f"File not found: {route}")
     except json.JSONDecodeError:
@@ -31,9 +38,8 @@ async def populate_json_data(motor: AsyncIOMotorClient, route: str):
 
 async def dump_json_data(motor: AsyncIOMotorClient, route: str):
     try:
-        data = await backup.dump_to_json(motor)
         with open(route, 'w', encoding='utf-8') as file:
-            json.dump(data, file, indent=4, cls=backup.BackupEncoder)
+            await backup.dump_to_json(motor, file)
             print(f"Data dumped to file: {route}")
     except Exception as e:
         print(f"An error occurred: {e}")
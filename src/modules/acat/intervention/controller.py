@@ -1,18 +1,27 @@
 import re
 import os
+import asyncio
 from typing import Optional
-from datetime import date
+from datetime import date, datetime, time
 from uuid import uuid4
 
-import openpyxl
 from pydantic import UUID4, ValidationError
 from fastapi import HTTPException, status, UploadFile
+from fastapi.responses import Response
 
 from src.core.deps import DataBaseDep
 from src.core.database.base_crud import BulkOperation
 from src.core.utils.helpers import parse_validation_error
+from src.core.utils.excel import ExcelRow, iter_excel_rows
+from src.core.database.projection import parse_fields
+from src.core.utils.responses import model_response
+from src.core.utils.streaming import ListFormat, ndjson_response
 from src.modules.acat.intervention import service, model
 from src.modules.acat.patient import service as patient_service, model as patient_model
+from src.modules.shared.imports.model import ImportJob, InvalidImportRow
+from src.modules.shared.imports.service import (
+    ImportProgress, create_import_job_service, write_in_batches
+)
 
 
 async def get_interventions_controller(
@@ -22,18 +31,22 @@ async def get_interventions_controller(
     technician: Optional[str],
     patient: Optional[UUID4],
     limit: int = 100,
-    offset: int = 0
-) -> model.GetInterventions:
-    interventions = await service.get_interventions_service(
-        db,
+    offset: int = 0,
+    estimated_count: bool = False,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    response_format: ListFormat = ListFormat.JSON
+) -> Response:
+    fields = parse_fields(model.Intervention, fields)
+    filters = (
         (
             'date', {
-                '$lte': before_date.isoformat()
+                '$lte': datetime.combine(before_date, time.max)
             } if before_date is not None else None
         ),
         (
             'date', {
-                '$gte': after_date.isoformat()
+                '$gte': datetime.combine(after_date, time.min)
             } if after_date is not None else None
         ),
         (
@@ -44,13 +57,30 @@ async def get_interventions_controller(
         (
             'patient.id', patient
         ),
+    )
+    if response_format == ListFormat.NDJSON:
+        return await ndjson_response(service.iter_interventions_page_service(
+            db,
+            *filters,
+            limit=limit,
+            offset=offset,
+            cursor=cursor,
+            fields=fields
+        ))
+    interventions, total_elements, next_cursor = await service.get_interventions_page_service(
+        db,
+        *filters,
         limit=limit,
-        skip=offset
+        offset=offset,
+        estimated_count=estimated_count,
+        cursor=cursor,
+        fields=fields
     )
-    return model.GetInterventions(
+    return model_response(model.GetInterventions(
         elements=interventions,
-        total_elements=await service.count_interventions_service(db, query={})
-    )
+        total_elements=total_elements,
+        next_cursor=next_cursor
+    ))
 
 
 async def get_intervention_details_controller(db: DataBaseDep, intervention_id: UUID4):
@@ -120,7 +150,7 @@ async def delete_intervention_controller(db: DataBaseDep, intervention_id: UUID4
     await service.delete_intervention_service(db, query={'id': intervention_id})
 
 
-async def upload_excel_interventions_controller(db: DataBaseDep, patients: UploadFile) -> None:
+async def upload_excel_interventions_controller(db: DataBaseDep, patients: UploadFile) -> ImportJob:
     [_, extension] = os.path.splitext(patients.filename)
     if extension[1:] not in ['xlsx', 'xlsm']:
         raise HTTPException(
@@ -130,6 +160,10 @@ async def upload_excel_interventions_controller(db: DataBaseDep, patients: Uploa
                 f'"{extension[1:]}" are not supported.'
             )
         )
+    return await create_import_job_service(db, 'interventions', patients, import_interventions_excel)
+
+
+def parse_interventions_excel(content: bytes, progress: ImportProgress) -> list[ExcelRow]:
     fields_excel = [
         'fecha',
         'motivo',
@@ -138,39 +172,27 @@ async def upload_excel_interventions_controller(db: DataBaseDep, patients: Uploa
         'tecnico',
         'dni beneficiario'
     ]
-    wb = openpyxl.load_workbook(patients.file)
-    ws = wb.active
-    first_row = [
-        ws.cell(row=1, column=i).value
-        for i in range(1, len(fields_excel) + 1)
-    ]
-    if not all(
-        field in fields_excel for field in first_row
-    ):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail='The excel file is incorrect'
-        )
-    interventions_excel: list[model.Intervention] = []
-    for row in ws.iter_rows(
-        min_row=2,
-        min_col=1,
-        max_col=6,
-        values_only=True
-    ):
-        if all(value is None for value in row):
-            continue
+    rows_excel: list[ExcelRow] = []
+    for progress.row, row in iter_excel_rows(content, fields_excel):
         if row[0] is None or row[4] is None or row[5] is None:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail='The excel file is incorrect'
-            )
-        patient = await patient_service.get_patient_service(db, {'nid': row[5]})
+            raise InvalidImportRow('The excel file is incorrect')
+        rows_excel.append(ExcelRow(progress.row, row))
+    progress.row = None
+    return rows_excel
+
+
+async def import_interventions_excel(db: DataBaseDep, content: bytes, progress: ImportProgress) -> None:
+    rows_excel = await asyncio.to_thread(parse_interventions_excel, content, progress)
+    patients = await patient_service.get_patients_service(
+        db,
+        query={'nid': {'$in': list({row[5] for _, row in rows_excel})}}
+    )
+    patient_by_nid = {p.nid: p for p in patients}
+    interventions_excel: list[model.Intervention] = []
+    for progress.row, row in rows_excel:
+        patient = patient_by_nid.get(row[5])
         if patient is None:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f'Patient with nid {row[5]} not found'
-            )
+            raise InvalidImportRow(f'Patient with nid {row[5]} not found')
         try:
             new_intervention = model.Intervention(
                 id=uuid4(),
@@ -182,10 +204,7 @@ async def upload_excel_interventions_controller(db: DataBaseDep, patients: Uploa
                 patient=patient_model.Patient(**patient.model_dump())
             )
         except ValidationError as e:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=parse_validation_error(e.errors())
-            )
+            raise InvalidImportRow(parse_validation_error(e.errors()))
         interventions_excel.append(new_intervention)
     intervention_operations = [
         BulkOperation(
@@ -194,5 +213,9 @@ async def upload_excel_interventions_controller(db: DataBaseDep, patients: Uploa
         )
         for intervention in interventions_excel
     ]
-    if len(intervention_operations) > 0:
-        await service.bulk_service(db, operations=intervention_operations, ordered=False)
+    progress.row = None
+    await write_in_batches(
+        progress,
+        intervention_operations,
+        lambda batch: service.bulk_service(db, operations=batch, ordered=False)
+    )
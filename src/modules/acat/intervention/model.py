@@ -1,8 +1,11 @@
 from typing import Optional
 from datetime import datetime
 
-from pydantic import BaseModel, UUID4, NonNegativeInt
+from pydantic import BaseModel, UUID4, NonNegativeInt, SerializeAsAny
+from pymongo import ASCENDING, IndexModel
 from src.core.database.base_crud import BaseMongo
+from src.core.database.codecs import NaiveUTCDatetime
+from src.core.database.projection import PartialDocument
 from src.modules.acat.patient.model import Patient
 
 INTERVENTION_NONE_FIELDS = [
@@ -11,8 +14,14 @@ INTERVENTION_NONE_FIELDS = [
 
 
 class Intervention(BaseMongo):
+    __indexes__ = [
+        IndexModel([('patient.id', ASCENDING), ('date', ASCENDING)]),
+        IndexModel([('date', ASCENDING), ('_id', ASCENDING)]),
+    ]
+    __cursor_sort__ = [('date', ASCENDING), ('_id', ASCENDING)]
+
     id: UUID4
-    date: datetime
+    date: NaiveUTCDatetime
     reason: Optional[str]
     typology: Optional[str]
     observations: Optional[str]
@@ -40,5 +49,6 @@ class InterventionUpdate(BaseModel):
 
 
 class GetInterventions(BaseModel):
-    elements: list[Intervention]
+    elements: list[Intervention | SerializeAsAny[PartialDocument]]
     total_elements: NonNegativeInt
+    next_cursor: Optional[str] = None
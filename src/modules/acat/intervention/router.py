@@ -2,10 +2,12 @@ from typing import Optional
 from datetime import date
 
 from pydantic import UUID4
-from fastapi import APIRouter, status, UploadFile
+from fastapi import APIRouter, status, UploadFile, Query
 
 from src.core.deps import DataBaseDep
+from src.core.utils.streaming import ListFormat
 from src.server import dependencies
+from src.modules.shared.imports.model import ImportJob
 from src.modules.acat.intervention import controller
 from src.modules.acat.intervention import model
 
@@ -18,7 +20,10 @@ router = APIRouter(tags=['Intervention'], dependencies=dependencies)
     status_code=status.HTTP_200_OK,
     response_model=model.GetInterventions,
     responses={
-        200: {"description": "Successful Response"},
+        200: {
+            "description": "Successful Response",
+            "content": {"application/x-ndjson": {}}
+        },
         500: {"description": "Internal Server Error"}
     }
 )
@@ -29,7 +34,11 @@ async def get_interventions(
     technician: Optional[str] = None,
     patient: Optional[UUID4] = None,
     limit: int = 100,
-    offset: int = 0
+    offset: int = 0,
+    estimated_count: bool = False,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    response_format: ListFormat = Query(ListFormat.JSON, alias='format')
 ):
     """
     **Retrieve a list of all interventions.**
@@ -38,11 +47,23 @@ async def get_interventions(
     includes its ID, date of the intervention, reason for the intervention (if provided),
     typology (if provided), observations (if provided), the technician responsible for the
     intervention, and the patient associated with the intervention.
+
+    total_elements is the number of interventions that match the filters; for unfiltered
+    listings it can be estimated from the collection metadata with estimated_count.
+
+    With a cursor the interventions are returned in date order, starting after the position
+    it encodes; an empty cursor requests the first page.
+
+    Restrict the returned attributes with fields, a comma separated list such as
+    "date,technician"; the id is always included.
+
+    format=ndjson streams the page as newline delimited JSON instead of a single document,
+    leaving out total_elements and next_cursor.
     """
     return await controller.get_interventions_controller(
         db,
         before_date, after_date, technician, patient,
-        limit, offset
+        limit, offset, estimated_count, cursor, fields, response_format
     )
 
 
@@ -91,15 +112,20 @@ async def create_intervention(db: DataBaseDep, intervention: model.InterventionC
 
 @router.post(
     '/excel',
-    status_code=status.HTTP_204_NO_CONTENT,
-    response_model=None,
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=ImportJob,
     responses={
-        200: {"description": "Patients in excel created successfully"},
+        202: {"description": "Import of the excel started"},
         400: {"description": "The data was incorrect"},
-        404: {"description": "Patient not found"},
     }
 )
 async def upload_excel_intervention(db: DataBaseDep, interventions: UploadFile):
+    """
+    **Import interventions from an excel file.**
+
+    Checks the file extension and returns an import job right away; the rows are read
+    and written in the background. Poll `shared/imports/{job_id}` to follow the job.
+    """
     return await controller.upload_excel_interventions_controller(db, interventions)
 
 
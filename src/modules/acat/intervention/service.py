@@ -1,4 +1,4 @@
-from typing import Any
+from typing import Any, AsyncIterator, Optional
 
 from fastapi import HTTPException, status
 from pydantic import UUID4
@@ -6,7 +6,8 @@ from pydantic import UUID4
 from src.core.deps import DataBaseDep
 from src.core.database.base_crud import BulkOperation
 from src.core.database.mongo_types import DeleteResultMongo, InsertOneResultMongo, UpdateResult, BulkWriteResult
-from src.core.utils.helpers import get_all_combinations
+from src.core.database.filters import compile_filters
+from src.core.database.projection import PartialDocument
 from src.modules.acat.intervention import model
 from src.modules.acat.patient import model as patient_model
 
@@ -23,20 +24,48 @@ async def get_interventions_service(
     *args: Any,
     **kwargs: Any
 ) -> list[model.Intervention]:
-    query_combinations = get_all_combinations(args)
-    query: dict = None
-    for combination in query_combinations:
-        if any(c[1] is None for c in combination):
-            continue
-        query = {c[0]: c[1] for c in combination}
-        date_queries = [c for c in combination if c[0] == 'date']
-        if len(date_queries) == 2:
-            query['date'] = dict(
-                date_queries[0][1], **date_queries[1][1]
-            )
+    query = compile_filters(args)
     return await model.Intervention.get_multi(db, query=query, **kwargs)
 
 
+async def get_interventions_page_service(
+    db: DataBaseDep,
+    *args: Any,
+    limit: int = 100,
+    offset: int = 0,
+    estimated_count: bool = False,
+    cursor: Optional[str] = None,
+    fields: Optional[tuple[str, ...]] = None,
+) -> tuple[list[model.Intervention | PartialDocument], int, Optional[str]]:
+    return await model.Intervention.get_page(
+        db,
+        query=compile_filters(args),
+        limit=limit,
+        skip=offset,
+        estimated_count=estimated_count,
+        cursor=cursor,
+        fields=fields
+    )
+
+
+def iter_interventions_page_service(
+    db: DataBaseDep,
+    *args: Any,
+    limit: int = 100,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    fields: Optional[tuple[str, ...]] = None,
+) -> AsyncIterator[model.Intervention | PartialDocument]:
+    return model.Intervention.iter_page(
+        db,
+        query=compile_filters(args),
+        limit=limit,
+        skip=offset,
+        cursor=cursor,
+        fields=fields
+    )
+
+
 async def create_intervention_service(
     db: DataBaseDep,
     intervention_data: model.InterventionCreate,
@@ -108,7 +137,3 @@ async def delete_intervention_service(db: DataBaseDep, query: dict) -> model.Int
             status_code=status.HTTP_404_NOT_FOUND,
             detail='Intervention not found',
         )
-
-
-async def count_interventions_service(db: DataBaseDep, query: dict) -> int:
-    return await model.Intervention.count(db, query)
@@ -1,3 +1,4 @@
+import asyncio
 import os
 import re
 from typing import Optional
@@ -6,13 +7,25 @@ from datetime import date
 
 from pydantic import UUID4, ValidationError
 from fastapi import HTTPException, status, UploadFile
-import openpyxl
+from fastapi.responses import Response
+from pymongo.errors import BulkWriteError
 
-from src.core.utils.helpers import parse_validation_error, generate_alias, get_valid_mongo_obj
+from src.core.utils.helpers import parse_validation_error, generate_alias
+from src.core.utils.excel import iter_excel_rows
 from src.core.deps import DataBaseDep
 from src.core.database.base_crud import BulkOperation
+from src.core.database.projection import parse_fields
+from src.core.utils.responses import model_response
+from src.core.utils.streaming import ListFormat, ndjson_response
 from src.modules.acat.patient import model, service
 from src.modules.acat.intervention import model as intervention_model, service as intervention_service
+from src.modules.shared.imports.model import ImportJob, InvalidImportRow
+from src.modules.shared.imports.service import (
+    ImportProgress, create_import_job_service, write_in_batches
+)
+
+# Código de MongoDB al violar un índice único
+DUPLICATE_KEY_ERROR = 11000
 
 
 async def get_patients_controller(
@@ -24,11 +37,14 @@ async def get_patients_controller(
     before_registration_date: Optional[date] = None,
     after_registration_date: Optional[date] = None,
     limit: int = 100,
-    offset: int = 0
-) -> model.GetPatients:
-    patients = await service.get_patients_service(
-        db,
-        None,
+    offset: int = 0,
+    estimated_count: bool = False,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    response_format: ListFormat = ListFormat.JSON
+) -> Response:
+    fields = parse_fields(model.Patient, fields)
+    filters = (
         (
             'alias', {
                 '$regex': re.compile(f'^{alias}', re.IGNORECASE)
@@ -51,13 +67,30 @@ async def get_patients_controller(
                 '$gte': after_registration_date.isoformat()
             } if after_registration_date is not None else None
         ),
+    )
+    if response_format == ListFormat.NDJSON:
+        return await ndjson_response(service.iter_patients_page_service(
+            db,
+            *filters,
+            limit=limit,
+            offset=offset,
+            cursor=cursor,
+            fields=fields
+        ))
+    patients, total_elements, next_cursor = await service.get_patients_page_service(
+        db,
+        *filters,
         limit=limit,
-        skip=offset
+        offset=offset,
+        estimated_count=estimated_count,
+        cursor=cursor,
+        fields=fields
     )
-    return model.GetPatients(
+    return model_response(model.GetPatients(
         elements=patients,
-        total_elements=await service.count_patients_service(db, query={})
-    )
+        total_elements=total_elements,
+        next_cursor=next_cursor
+    ))
 
 
 async def create_patient_controller(db: DataBaseDep, patient: model.PatientCreate) -> model.Patient:
@@ -86,7 +119,7 @@ async def get_patient_details_controller(db: DataBaseDep, patient_id: UUID4):
     return result
 
 
-async def upload_excel_patients_controller(db: DataBaseDep, patients: UploadFile) -> None:
+async def upload_excel_patients_controller(db: DataBaseDep, patients: UploadFile) -> ImportJob:
     [_, extension] = os.path.splitext(patients.filename)
     if extension[1:] not in ['xlsx', 'xlsm']:
         raise HTTPException(
@@ -96,6 +129,10 @@ async def upload_excel_patients_controller(db: DataBaseDep, patients: UploadFile
                 f'"{extension[1:]}" are not supported.'
             )
         )
+    return await create_import_job_service(db, 'patients', patients, import_patients_excel)
+
+
+def parse_patients_excel(content: bytes, progress: ImportProgress) -> list[model.PatientCreate]:
     fields_excel = [
         'nombre',
         'primer apellido',
@@ -109,36 +146,13 @@ async def upload_excel_patients_controller(db: DataBaseDep, patients: UploadFile
         'rehabilitado',
         'tecnico',
         'observacion']
-    wb = openpyxl.load_workbook(patients.file)
-    ws = wb.active
-    first_row = [
-        ws.cell(row=1, column=i).value
-        for i in range(1, len(fields_excel) + 1)
-    ]
-    if not all(
-            field in fields_excel for field in first_row):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail='The excel file is incorrect'
-        )
     patients_excel: list[model.PatientCreate] = []
-    for row in ws.iter_rows(
-            min_row=2,
-            min_col=1,
-            max_col=12,
-            values_only=True):
-        if all(value is None for value in row):
-            continue
+    nids_excel: set[str] = set()
+    for progress.row, row in iter_excel_rows(content, fields_excel):
         if row[0] is None or row[1] is None or row[3] is None or row[4] is None or row[8] is None:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail='The excel file is incorrect'
-            )
+            raise InvalidImportRow('The excel file is incorrect')
         if row[5] is not None and row[5] not in ['Hombre', 'Mujer']:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail='The excel file is incorrect'
-            )
+            raise InvalidImportRow('The excel file is incorrect')
         try:
             new_patient = model.PatientCreate(
                 name=row[0],
@@ -158,11 +172,17 @@ async def upload_excel_patients_controller(db: DataBaseDep, patients: UploadFile
                 observation=row[11],
             )
         except ValidationError as e:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=parse_validation_error(e.errors())
-            )
+            raise InvalidImportRow(parse_validation_error(e.errors()))
+        if new_patient.nid in nids_excel:
+            raise InvalidImportRow(f'The nid {new_patient.nid} is repeated in the excel file')
+        nids_excel.add(new_patient.nid)
         patients_excel.append(new_patient)
+    progress.row = None
+    return patients_excel
+
+
+async def import_patients_excel(db: DataBaseDep, content: bytes, progress: ImportProgress) -> None:
+    patients_excel = await asyncio.to_thread(parse_patients_excel, content, progress)
     patients_db = await service.get_patients_service(db, query={'nid': {'$in': [p.nid for p in patients_excel]}})
     nids_db = [p.nid for p in patients_db]
     patients_create = []
@@ -180,7 +200,7 @@ async def upload_excel_patients_controller(db: DataBaseDep, patients: UploadFile
             patients_update.append(
                 BulkOperation(
                     bulk_type='UpdateOne',
-                    data={'$set': get_valid_mongo_obj(p.model_dump())},
+                    data={'$set': p.model_dump()},
                     query=model.Patient.prepare_query({'nid': p.nid})
                 )
             )
@@ -188,25 +208,40 @@ async def upload_excel_patients_controller(db: DataBaseDep, patients: UploadFile
                 BulkOperation(
                     bulk_type='UpdateMany',
                     data={'$set': {
-                        'patient': get_valid_mongo_obj(
-                            model.Patient(
-                                **p.model_dump(),
-                                id=next(
-                                    p_aux for p_aux in patients_db if p_aux.nid == p.nid
-                                ).id
-                            ).model_dump()
-                        )
+                        'patient': model.Patient(
+                            **p.model_dump(),
+                            id=next(
+                                p_aux for p_aux in patients_db if p_aux.nid == p.nid
+                            ).id
+                        ).model_dump()
                     }},
                     query=intervention_model.Intervention.prepare_query(
                         {'patient.nid': p.nid}
                     )
                 )
             )
-    patients_operations = patients_create + patients_update
-    if len(patients_operations) > 0:
-        await service.bulk_service(db, operations=patients_operations, ordered=False)
-    if len(interventions_update) > 0:
-        await intervention_service.bulk_service(db, operations=interventions_update, ordered=False)
+    try:
+        await write_in_batches(
+            progress,
+            patients_create + patients_update,
+            lambda batch: service.bulk_service(db, operations=batch, ordered=False)
+        )
+    except BulkWriteError as e:
+        # Otro proceso creó un paciente con el mismo nid después de leerlos
+        duplicated = [
+            error for error in e.details.get('writeErrors', [])
+            if error.get('code') == DUPLICATE_KEY_ERROR
+        ]
+        if len(duplicated) == 0:
+            raise
+        nid = duplicated[0].get('keyValue', {}).get('nid')
+        raise InvalidImportRow(f'There is already one patient with nid {nid}')
+    await write_in_batches(
+        progress,
+        interventions_update,
+        lambda batch: intervention_service.bulk_service(db, operations=batch, ordered=False),
+        count_rows=False
+    )
 
 
 async def update_patient_controller(
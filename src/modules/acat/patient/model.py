@@ -2,11 +2,14 @@ from typing import Optional, Self
 from datetime import date
 from enum import Enum
 
-from pydantic import BaseModel, UUID4, PastDate, NonNegativeInt, model_validator
+from pydantic import BaseModel, UUID4, PastDate, NonNegativeInt, SerializeAsAny, model_validator
 from fastapi import HTTPException, status
+from pymongo import ASCENDING, IndexModel
 
 from src.core.database.base_crud import BaseMongo
-from src.core.utils.helpers import calculate_age, check_nid
+from src.core.database.projection import PartialDocument
+from src.core.utils.helpers import calculate_age
+from src.core.utils.validators import check_nid
 
 PATIENT_NONE_FIELDS = [
     'second_surname', 'gender', 'address',
@@ -20,6 +23,14 @@ class Gender(Enum):
 
 
 class Patient(BaseMongo):
+    __indexes__ = [
+        IndexModel([('nid', ASCENDING)], unique=True),
+        IndexModel([('alias', ASCENDING)]),
+        IndexModel([('name', ASCENDING)]),
+        IndexModel([('registration_date', ASCENDING), ('_id', ASCENDING)]),
+    ]
+    __cursor_sort__ = [('registration_date', ASCENDING), ('_id', ASCENDING)]
+
     id: UUID4
     name: str
     first_surname: str
@@ -114,5 +125,6 @@ class PatientOut(BaseModel):
 
 
 class GetPatients(BaseModel):
-    elements: list[Patient]
+    elements: list[Patient | SerializeAsAny[PartialDocument]]
     total_elements: NonNegativeInt
+    next_cursor: Optional[str] = None
@@ -1,11 +1,13 @@
 from typing import Optional
 from datetime import date
 
-from fastapi import APIRouter, status, UploadFile
+from fastapi import APIRouter, status, UploadFile, Query
 from pydantic import UUID4
 
 from src.core.deps import DataBaseDep
+from src.core.utils.streaming import ListFormat
 from src.server import dependencies
+from src.modules.shared.imports.model import ImportJob
 from src.modules.acat.patient import controller
 from src.modules.acat.patient import model
 
@@ -16,7 +18,10 @@ router = APIRouter(tags=['Patient'], dependencies=dependencies)
             status_code=status.HTTP_200_OK,
             response_model=model.GetPatients,
             responses={
-                200: {"description": "Successful Response"},
+                200: {
+                    "description": "Successful Response",
+                    "content": {"application/x-ndjson": {}}
+                },
                 500: {"description": "Internal Server Error"}
             })
 async def get_patients(
@@ -28,7 +33,11 @@ async def get_patients(
     before_registration_date: Optional[date] = None,
     after_registration_date: Optional[date] = None,
     limit: int = 100,
-    offset: int = 0
+    offset: int = 0,
+    estimated_count: bool = False,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    response_format: ListFormat = Query(ListFormat.JSON, alias='format')
 ):
     """
     **Retrieve a list of all patients.**
@@ -38,12 +47,24 @@ async def get_patients(
     identification number (nid), birth date, gender (if any), address (if any), contact phone (if any),
     dossier number, first technician assigned to the patient (if any), registration date, any
     observations about the patient, and the calculated age of the patient.
+
+    total_elements counts the patients matching the filters. Unfiltered listings may use
+    estimated_count to skip the exact count.
+
+    Cursor pagination orders the patients by registration date: send an empty cursor for
+    the first page and the returned next_cursor for the following ones.
+
+    When fields is given (for instance "name,alias") each patient only carries those
+    attributes and its ID. Unknown field names are rejected with a 400.
+
+    Reporting clients may set format=ndjson to receive one patient per line, streamed from
+    the database cursor, with no count.
     """
     return await controller.get_patients_controller(
         db,
         alias, name, nid, is_rehabilitated,
         before_registration_date, after_registration_date,
-        limit, offset
+        limit, offset, estimated_count, cursor, fields, response_format
     )
 
 
@@ -111,14 +132,20 @@ async def get_patient_details(db: DataBaseDep, patient_id: UUID4):
 
 @router.post(
     '/excel',
-    status_code=status.HTTP_204_NO_CONTENT,
-    response_model=None,
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=ImportJob,
     responses={
-        200: {"description": "Patients in excel created successfully"},
+        202: {"description": "Import of the excel started"},
         400: {"description": "The data was incorrect"},
     }
 )
 async def upload_excel_patient(db: DataBaseDep, patients: UploadFile):
+    """
+    **Import patients from an excel file.**
+
+    Checks the file extension and returns an import job right away; the rows are read
+    and written in the background. Poll `shared/imports/{job_id}` to follow the job.
+    """
     return await controller.upload_excel_patients_controller(db, patients)
 
 
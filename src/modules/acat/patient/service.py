@@ -1,12 +1,14 @@
-from typing import Any, Optional
+from typing import Any, AsyncIterator, Optional
 
 from fastapi import HTTPException, status
 from pydantic import UUID4
+from pymongo.errors import DuplicateKeyError
 
 from src.core.database.base_crud import BulkOperation
 from src.core.database.mongo_types import InsertOneResultMongo, DeleteResultMongo, UpdateResult, BulkWriteResult
+from src.core.database.filters import compile_filters
+from src.core.database.projection import PartialDocument
 from src.core.deps import DataBaseDep
-from src.core.utils.helpers import get_all_combinations
 from src.modules.acat.patient import model
 
 
@@ -20,26 +22,60 @@ async def get_patients_service(
     *args: Any,
     **kwargs: Any
 ) -> list[model.Patient]:
-    query_combinations = get_all_combinations(args)
-    query_parameters = None
-    for combination in query_combinations:
-        if any(c[1] is None for c in combination):
-            continue
-        query_parameters = {c[0]: c[1] for c in combination}
-        date_queries = [c for c in combination if c[0] == 'registration_date']
-        if len(date_queries) == 2:
-            query_parameters['registration_date'] = dict(
-                date_queries[0][1], **date_queries[1][1]
-            )
-    if query_parameters is not None:
+    query_parameters = compile_filters(args)
+    if len(query_parameters) > 0:
         if query is None:
             query = {}
         query.update(query_parameters)
     return await model.Patient.get_multi(db, query, **kwargs)
 
 
+async def get_patients_page_service(
+    db: DataBaseDep,
+    *args: Any,
+    limit: int = 100,
+    offset: int = 0,
+    estimated_count: bool = False,
+    cursor: Optional[str] = None,
+    fields: Optional[tuple[str, ...]] = None,
+) -> tuple[list[model.Patient | PartialDocument], int, Optional[str]]:
+    return await model.Patient.get_page(
+        db,
+        query=compile_filters(args),
+        limit=limit,
+        skip=offset,
+        estimated_count=estimated_count,
+        cursor=cursor,
+        fields=fields
+    )
+
+
+def iter_patients_page_service(
+    db: DataBaseDep,
+    *args: Any,
+    limit: int = 100,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    fields: Optional[tuple[str, ...]] = None,
+) -> AsyncIterator[model.Patient | PartialDocument]:
+    return model.Patient.iter_page(
+        db,
+        query=compile_filters(args),
+        limit=limit,
+        skip=offset,
+        cursor=cursor,
+        fields=fields
+    )
+
+
 async def create_patient_service(db: DataBaseDep, patient: model.PatientCreate) -> InsertOneResultMongo:
-    result: InsertOneResultMongo = await model.Patient.create(db, obj_to_create=patient.model_dump())
+    try:
+        result: InsertOneResultMongo = await model.Patient.create(db, obj_to_create=patient.model_dump())
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'There is already one patient with nid {patient.nid}'
+        )
     if not result.acknowledged:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -95,12 +131,18 @@ async def update_patient_service(
     updated_patient_data: dict,
     **kwargs: Any
 ) -> model.Patient | None:
-    return await model.Patient.update(
-        db,
-        query=query,
-        data_to_update=updated_patient_data,
-        **kwargs
-    )
+    try:
+        return await model.Patient.update(
+            db,
+            query=query,
+            data_to_update=updated_patient_data,
+            **kwargs
+        )
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'There is already one patient with nid {updated_patient_data.get("nid")}'
+        )
 
 
 async def delete_patient_service(db: DataBaseDep, query: dict) -> model.Patient:
@@ -115,7 +157,3 @@ async def delete_patient_service(db: DataBaseDep, query: dict) -> model.Patient:
             status_code=status.HTTP_404_NOT_FOUND,
             detail='Patient not found',
         )
-
-
-async def count_patients_service(db: DataBaseDep, query: dict) -> int:
-    return await model.Patient.count(db, query)
@@ -1,19 +1,28 @@
+import asyncio
 import os
 from collections import Counter
 from uuid import uuid4
-from typing import Dict, Optional
-from datetime import date
+from typing import AsyncIterator, Dict, Optional
+from datetime import date, datetime, time
 
-import openpyxl
 from pydantic import UUID4, ValidationError
 from fastapi import HTTPException, status, UploadFile
+from fastapi.responses import Response
 
 from src.core.deps import DataBaseDep
-from src.core.database.base_crud import BulkOperation
-from src.core.utils.helpers import parse_validation_error, get_valid_mongo_obj
+from src.core.database.base_crud import BulkOperation, ITER_BATCH_SIZE
+from src.core.database.projection import PartialDocument, parse_fields, partial_model
+from src.core.utils.helpers import parse_validation_error
+from src.core.utils.excel import ExcelRow, iter_excel_rows
+from src.core.utils.responses import model_response
+from src.core.utils.streaming import ListFormat, ndjson_response
 from src.modules.cyc.delivery import model, service
 from src.modules.cyc.family import service as family_service
 from src.modules.cyc.warehouse import service as product_service, model as product_model
+from src.modules.shared.imports.model import ImportJob, InvalidImportRow
+from src.modules.shared.imports.service import (
+    ImportProgress, create_import_job_service, write_in_batches
+)
 
 
 async def get_deliveries_controller(
@@ -23,18 +32,22 @@ async def get_deliveries_controller(
     state: Optional[model.State],
     family: Optional[UUID4],
     limit: int = 100,
-    offset: int = 0
-) -> model.GetDeliveries:
-    deliveries = await service.get_deliveries_service(
-        db,
+    offset: int = 0,
+    estimated_count: bool = False,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    response_format: ListFormat = ListFormat.JSON
+) -> Response:
+    fields = parse_fields(model.DeliveryOut, fields)
+    filters = (
         (
             'date', {
-                '$lte': before_date.isoformat()
+                '$lte': datetime.combine(before_date, time.max)
             } if before_date is not None else None
         ),
         (
             'date', {
-                '$gte': after_date.isoformat()
+                '$gte': datetime.combine(after_date, time.min)
             } if after_date is not None else None
         ),
         (
@@ -43,68 +56,115 @@ async def get_deliveries_controller(
         (
             'family_id', family
         ),
-        limit=limit,
-        skip=offset
     )
-    warehouses = await product_service.get_warehouses_service(db, query=None)
-    product_to_name: dict[UUID4, tuple[str, str]] = {
-        product.id: (product.name, warehouse.name)
-        for warehouse in warehouses for product in warehouse.products
-    }
-    deliveries_out = []
-    for delivery in deliveries:
-        updated_lines = []
-        for line in delivery.lines:
-            product_info = product_to_name.get(line.product_id)
-            updated_line = model.DeliveryLineOut(
-                **line.model_dump(),
-                name=product_info[0] if product_info else "",
-                warehouse=product_info[1] if product_info else ""
-            )
-            updated_lines.append(updated_line)
-        out = model.DeliveryOut(
-            id=delivery.id,
-            date=delivery.date,
-            months=delivery.months,
-            state=delivery.state,
-            lines=updated_lines,
-            family_id=delivery.family_id
+    if response_format == ListFormat.NDJSON:
+        deliveries = service.iter_deliveries_page_service(
+            db,
+            *filters,
+            limit=limit,
+            offset=offset,
+            cursor=cursor,
+            fields=fields,
+            construct=True
         )
-        deliveries_out.append(out)
-    return model.GetDeliveries(
-        elements=deliveries_out,
-        total_elements=await service.count_deliveries_service(db, query={})
+        return await ndjson_response(iter_deliveries_out(db, deliveries, fields))
+    deliveries, total_elements, next_cursor = await service.get_deliveries_page_service(
+        db,
+        *filters,
+        limit=limit,
+        offset=offset,
+        estimated_count=estimated_count,
+        cursor=cursor,
+        fields=fields,
+        construct=True
     )
+    return model_response(model.GetDeliveries(
+        elements=await build_deliveries_out(db, deliveries, fields),
+        total_elements=total_elements,
+        next_cursor=next_cursor
+    ))
 
 
-async def get_delivery_details_controller(db: DataBaseDep, delivery_id: int) -> model.DeliveryOut:
-    result = await service.get_delivery_service(db, query={'id': delivery_id})
+async def iter_deliveries_out(
+    db: DataBaseDep,
+    deliveries: AsyncIterator[model.Delivery | PartialDocument],
+    fields: Optional[tuple[str, ...]] = None
+) -> AsyncIterator[model.DeliveryOut | PartialDocument]:
+    # Los nombres de los productos se resuelven por lotes
+    batch = []
+    async for delivery in deliveries:
+        batch.append(delivery)
+        if len(batch) == ITER_BATCH_SIZE:
+            for delivery_out in await build_deliveries_out(db, batch, fields):
+                yield delivery_out
+            batch = []
+    for delivery_out in await build_deliveries_out(db, batch, fields):
+        yield delivery_out
+
+
+async def build_deliveries_out(
+    db: DataBaseDep,
+    deliveries: list[model.Delivery | PartialDocument],
+    fields: Optional[tuple[str, ...]] = None
+) -> list[model.DeliveryOut | PartialDocument]:
+    # Las entregas pueden venir sin validar (model_construct): sus líneas son
+    # entonces diccionarios y se validan una única vez al construir la salida
+    with_lines = fields is None or 'lines' in fields
+    lines_by_delivery = [
+        [dict(line) for line in delivery.lines] if with_lines else None
+        for delivery in deliveries
+    ]
+    product_to_name = {}
+    if with_lines:
+        product_to_name = await product_service.get_products_names_service(
+            db,
+            list({line['product_id'] for lines in lines_by_delivery for line in lines})
+        )
+    output_model = model.DeliveryOut if fields is None else partial_model(model.DeliveryOut, fields)
+    deliveries_out = []
+    for delivery, lines in zip(deliveries, lines_by_delivery):
+        data = dict(delivery)
+        if with_lines:
+            for line in lines:
+                product_info = product_to_name.get(line['product_id'])
+                line['name'] = product_info[0] if product_info else ""
+                line['warehouse'] = product_info[1] if product_info else ""
+            data['lines'] = lines
+        deliveries_out.append(output_model.model_validate(data))
+    return deliveries_out
+
+
+async def get_delivery_details_controller(db: DataBaseDep, delivery_id: int) -> Response:
+    result = await service.get_delivery_service(db, query={'id': delivery_id}, construct=True)
     if result is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail='Delivery not found',
         )
-    warehouses = await product_service.get_warehouses_service(db, query=None)
-    product_to_name: dict[UUID4, tuple[str, str]] = {
-        product.id: (product.name, warehouse.name)
-        for warehouse in warehouses for product in warehouse.products
-    }
-    updated_lines = []
-    for line in result.lines:
-        product_info = product_to_name.get(line.product_id)
-        updated_line = model.DeliveryLineOut(
-            **line.model_dump(),
-            name=product_info[0] if product_info else "",
-            warehouse=product_info[1] if product_info else ""
+    [delivery_out] = await build_deliveries_out(db, [result])
+    return model_response(delivery_out)
+
+
+def raise_stock_failures(
+    failures: list[product_model.StockMovementFailure],
+    product_by_id: dict[UUID4, product_model.Product]
+) -> None:
+    if len(failures) == 0:
+        return
+    details = []
+    for failure in failures:
+        product = product_by_id.get(failure.product_id)
+        if product is None or failure.available is None:
+            details.append(f'Product {failure.product_id} not found')
+            continue
+        details.append(
+            f'Not enough stock for product {product.name}. ' +
+            f'There is only {failure.available} left'
         )
-        updated_lines.append(updated_line)
-    salida = model.DeliveryOut(id=result.id,
-                               date=result.date,
-                               months=result.months,
-                               state=result.state,
-                               lines=updated_lines,
-                               family_id=result.family_id)
-    return salida
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail='\n'.join(details)
+    )
 
 
 async def create_delivery_controller(db: DataBaseDep, create_delivery: model.DeliveryCreate) -> model.Delivery:
@@ -125,56 +185,28 @@ async def create_delivery_controller(db: DataBaseDep, create_delivery: model.Del
             detail=f'Family {create_delivery.family_id} not found'
         )
 
-    # Recuperar almacenes y validar que todos los productos existan y tengan
-    # suficiente stock
-    warehouses = await product_service.get_warehouses_service(db, query=None)
-    product_to_warehouse: Dict[str, tuple] = {product.id: (
-        warehouse, product) for warehouse in warehouses for product in warehouse.products}
+    # Recuperar los productos de las líneas y validar que todos existan y
+    # tengan suficiente stock
+    products = await product_service.get_products_service(
+        db,
+        query={'id': {'$in': list(products_count)}}
+    )
+    product_by_id: Dict[UUID4, product_model.Product] = {p.id: p for p in products}
 
     missing_products = [
-        product_id for product_id in products_count if product_id not in product_to_warehouse]
+        product_id for product_id in products_count if product_id not in product_by_id]
     if missing_products:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail='Product not found in any warehouse'
         )
 
-    for product_id, required_quantity in (
-            (line.product_id, line.quantity) for line in create_delivery.lines):
-        warehouse, product = product_to_warehouse.get(product_id, (None, None))
-        if not warehouse or product.quantity < required_quantity:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f'Not enough stock for product {product.name}. ' +
-                f'There is only {product.quantity} left' if warehouse else 'Product not found')
-
-    # Preparar las actualizaciones por producto
-    product_updates = {}  # Diccionario para acumular actualizaciones
-    for line in create_delivery.lines:
-        warehouse, product = product_to_warehouse[line.product_id]
-        if product.id not in product_updates:
-            product_updates[product.id] = product.quantity - line.quantity
-        else:
-            product_updates[product.id] -= line.quantity
-    for warehouse in warehouses:
-        updated_products = []
-        for product in warehouse.products:
-            if product.id in product_updates:
-                updated_product = product_model.Product(
-                    id=product.id,
-                    name=product.name,
-                    quantity=product_updates[product.id],
-                    exp_date=product.exp_date
-                )
-            else:
-                updated_product = product
-            updated_products.append(updated_product.model_dump())
-
-        await product_service.update_warehouse_service(
-            db,
-            warehouse_id=warehouse.id,
-            warehouse_update={'products': updated_products}
-        )
+    # Descontar el stock de forma atómica por línea
+    failures = await product_service.apply_stock_movements_service(
+        db,
+        {line.product_id: -line.quantity for line in create_delivery.lines}
+    )
+    raise_stock_failures(failures, product_by_id)
     mongo_insert = await service.create_delivery_service(db, create_delivery)
     result = await service.get_delivery_service(db, query={'id': mongo_insert.inserted_id})
     return result
@@ -203,67 +235,33 @@ async def update_delivery_controller(db: DataBaseDep, delivery_id: UUID4, delive
                 detail='There is one product that is in two different lines. ' +
                 'Please put them in a single line')
 
-        warehouses = await product_service.get_warehouses_service(db, query=None)
-        product_to_warehouse = {
-            product.id: (
-                warehouse,
-                product) for warehouse in warehouses for product in warehouse.products}
+        products = await product_service.get_products_service(
+            db,
+            query={'id': {'$in': list(products_count)}}
+        )
+        product_by_id = {p.id: p for p in products}
 
         missing_products = [
-            product_id for product_id in products_count if product_id not in product_to_warehouse]
+            product_id for product_id in products_count if product_id not in product_by_id]
         if missing_products:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail='Product not found in any warehouse'
             )
 
-        product_updates = {}  # Diccionario para acumular diferencias de cantidad
-        for line in delivery.lines:
-            warehouse, product = product_to_warehouse.get(
-                line.product_id, (None, None))
-            if not warehouse or product is None:
-                continue  # Omitir si el producto no se encuentra en ningún almacén
-
-            # Calcula la diferencia de cantidad basada en la entrega actual y la
-            # nueva
-            old_quantity = next(
-                (old_line.quantity for old_line in delivery_actual.lines if old_line.product_id == line.product_id),
-                0)
-            quantity_difference = old_quantity - line.quantity
-
-            if product.id not in product_updates:
-                product_updates[product.id] = product.quantity + \
-                    quantity_difference
-            else:
-                product_updates[product.id] += quantity_difference
-
-            if product_updates[product.id] < 0:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f'Not enough stock for product {product.name}.' +
-                    f' There is only {product.quantity} left')
-
-        # Proceder con la actualización de las cantidades de los productos en sus
-        # respectivos almacenes
-        for warehouse in warehouses:
-            updated_products = []
-            for product in warehouse.products:
-                if product.id in product_updates:
-                    updated_product = product_model.Product(
-                        id=product.id,
-                        name=product.name,
-                        quantity=product_updates[product.id],
-                        exp_date=product.exp_date
-                    )
-                else:
-                    updated_product = product
-                updated_products.append(updated_product.model_dump())
-
-            await product_service.update_warehouse_service(
-                db,
-                warehouse_id=warehouse.id,
-                warehouse_update={'products': updated_products}
-            )
+        # Calcula la diferencia de cantidad basada en la entrega actual y la
+        # nueva
+        old_quantities = {
+            old_line.product_id: old_line.quantity for old_line in delivery_actual.lines
+        }
+        failures = await product_service.apply_stock_movements_service(
+            db,
+            {
+                line.product_id: old_quantities.get(line.product_id, 0) - line.quantity
+                for line in delivery.lines
+            }
+        )
+        raise_stock_failures(failures, product_by_id)
 
     # Asegurar que la familia existe
     if delivery.family_id:
@@ -286,41 +284,29 @@ async def delete_delivery_controller(db: DataBaseDep, delivery_id: UUID4):
     return await service.delete_delivery_service(db, query={'id': delivery_id})
 
 
-async def get_family_deliveries_controller(db: DataBaseDep, family_id: int) -> list[model.DeliveryOut]:
-    deliveries = await service.get_deliveries_service(db)
-    family_deliveries = [
-        delivery for delivery
-        in deliveries if delivery.family_id == family_id
-    ]
-    warehouses = await product_service.get_warehouses_service(db, query=None)
-    product_to_name: dict[UUID4, tuple[str, str]] = {
-        product.id: (product.name, warehouse.name)
-        for warehouse in warehouses for product in warehouse.products
-    }
-    result = []
-    for delivery in family_deliveries:
-        updated_lines = []
-        for line in delivery.lines:
-            product_info = product_to_name.get(line.product_id)
-            updated_line = model.DeliveryLineOut(
-                **line.model_dump(),
-                name=product_info[0],
-                warehouse=product_info[1]
-            )
-            updated_lines.append(updated_line)
-        out = model.DeliveryOut(
-            id=delivery.id,
-            date=delivery.date,
-            months=delivery.months,
-            state=delivery.state,
-            lines=updated_lines,
-            family_id=delivery.family_id
-        )
-        result.append(out)
-    return result
+async def get_family_deliveries_controller(
+    db: DataBaseDep,
+    family_id: UUID4,
+    limit: int = 100,
+    offset: int = 0,
+    cursor: Optional[str] = None
+) -> Response:
+    family_deliveries, total_elements, next_cursor = await service.get_deliveries_page_service(
+        db,
+        ('family_id', family_id),
+        limit=limit,
+        offset=offset,
+        cursor=cursor,
+        construct=True
+    )
+    return model_response(model.GetDeliveries(
+        elements=await build_deliveries_out(db, family_deliveries),
+        total_elements=total_elements,
+        next_cursor=next_cursor
+    ))
 
 
-async def upload_excel_deliveries_controller(db: DataBaseDep, deliveries: UploadFile) -> None:
+async def upload_excel_deliveries_controller(db: DataBaseDep, deliveries: UploadFile) -> ImportJob:
     [_, extension] = os.path.splitext(deliveries.filename)
     if extension[1:] not in ['xlsx', 'xlsm']:
         raise HTTPException(
@@ -330,6 +316,13 @@ async def upload_excel_deliveries_controller(db: DataBaseDep, deliveries: Upload
                 f'"{extension[1:]}" are not supported.'
             )
         )
+    return await create_import_job_service(db, 'deliveries', deliveries, import_deliveries_excel)
+
+
+def parse_deliveries_excel(
+    content: bytes,
+    progress: ImportProgress
+) -> tuple[list[ExcelRow], list[tuple[ExcelRow, model.State]]]:
     fields_delivery_excel = [
         'numero entrega', 'fecha', 'meses',
         'estado', 'documento identidad cabeza familia'
@@ -338,88 +331,56 @@ async def upload_excel_deliveries_controller(db: DataBaseDep, deliveries: Upload
         'numero entrega', 'almacen producto',
         'nombre producto', 'cantidad', 'estado'
     ]
-    wb = openpyxl.load_workbook(deliveries.file)
-    ws = wb.active
-    first_row_delivery = [
-        ws.cell(row=1, column=i).value
-        for i in range(1, len(fields_delivery_excel) + 1)
-    ]
-    first_row_line = [
-        ws.cell(row=1, column=i).value
-        for i in range(7, 6 + len(fields_line_excel) + 1)
-    ]
-    if not all(
-        field in fields_delivery_excel for field in first_row_delivery
-    ) and not all(
-        field in fields_line_excel for field in first_row_line
-    ):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail='The excel file is incorrect'
-        )
-    lines_excel: dict[int, list[model.DeliveryLine]] = {}
-    deliveries_excel: list[model.Delivery] = []
-    warehouses = await product_service.get_warehouses_service(db)
-    updated_products: dict[UUID4, list[product_model.Product]] = {}
-    for row in ws.iter_rows(
-        min_row=2,
-        min_col=7,
-        max_col=11,
-        values_only=True
-    ):
-        if all(value is None for value in row):
-            continue
+    line_rows: list[ExcelRow] = []
+    delivery_rows: list[tuple[ExcelRow, model.State]] = []
+    for progress.row, row in iter_excel_rows(content, fields_line_excel, min_col=7):
         if row[0] is None or row[1] is None or row[2] is None or row[3] is None or not isinstance(
                 row[3], int):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail='The excel file is incorrect'
-            )
-        warehouse = next(
-            (w for w in warehouses if w.name == str(row[1])),
-            None
-        )
+            raise InvalidImportRow('The excel file is incorrect')
+        line_rows.append(ExcelRow(progress.row, row))
+    for progress.row, row in iter_excel_rows(content, fields_delivery_excel):
+        if row[0] is None or row[1] is None or row[2] is None or row[3] is None or row[4] is None:
+            raise InvalidImportRow('The excel file is incorrect')
+        state_value = None
+        if row[3] not in ['Espera', 'Notificado', 'Entregado']:
+            raise InvalidImportRow('The excel file is incorrect')
+        else:
+            if row[3] == 'Espera':
+                state_value = model.State.NEXT
+            elif row[3] == 'Notificado':
+                state_value = model.State.NOTIFIED
+            else:
+                state_value = model.State.DELIVERED
+        delivery_rows.append((ExcelRow(progress.row, row), state_value))
+    progress.row = None
+    return line_rows, delivery_rows
+
+
+def build_delivery_lines_excel(
+    line_rows: list[ExcelRow],
+    progress: ImportProgress,
+    warehouses: dict[str, product_model.Warehouse],
+    product_by_name: dict[tuple[UUID4, str], product_model.Product]
+) -> tuple[dict[int, list[model.DeliveryLine]], dict[UUID4, int]]:
+    lines_excel: dict[int, list[model.DeliveryLine]] = {}
+    updated_products: dict[UUID4, int] = {}
+    for progress.row, row in line_rows:
+        warehouse = warehouses.get(str(row[1]))
         if warehouse is None:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f'Warehouse with name {row[1]} not found'
-            )
-        product = next(
-            (p for p in warehouse.products if p.name == row[2]),
-            None
-        )
+            raise InvalidImportRow(f'Warehouse with name {row[1]} not found')
+        product = product_by_name.get((warehouse.id, row[2]))
         if product is None:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f'Product with name {row[2]} not found'
-            )
+            raise InvalidImportRow(f'Product with name {row[2]} not found')
         if row[0] in lines_excel and product.id in [
                 l.product_id for l in lines_excel[row[0]]]:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f'Product {product.name} is twice in the delivery'
+            raise InvalidImportRow(f'Product {product.name} is twice in the delivery')
+        requested = updated_products.get(product.id, 0) + row[3]
+        if product.quantity - requested < 0:
+            raise InvalidImportRow(
+                "There aren't enough products"
+                f"{product.name} for the delivery"
             )
-        if product.quantity - row[3] < 0:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=(
-                    "There aren't enough products"
-                    f"{product.name} for the delivery"
-                )
-            )
-        updated_product = product_model.Product(
-            **product.model_dump(exclude=['quantity']),
-            quantity=product.quantity - row[3]
-        )
-        if (warehouse.id not in updated_products):
-            products = warehouse.products.copy()
-            products.pop(products.index(product))
-            updated_products[warehouse.id] = products + [updated_product]
-        else:
-            updated_products[warehouse.id].pop(
-                updated_products[warehouse.id].index(product)
-            )
-            updated_products[warehouse.id].append(updated_product)
+        updated_products[product.id] = requested
         try:
             new_line = model.DeliveryLine(
                 product_id=product.id,
@@ -427,80 +388,74 @@ async def upload_excel_deliveries_controller(db: DataBaseDep, deliveries: Upload
                 state=row[4]
             )
         except ValidationError as e:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=parse_validation_error(e.errors())
-            )
+            raise InvalidImportRow(parse_validation_error(e.errors()))
         if (row[0] not in lines_excel):
             lines_excel[row[0]] = [new_line]
         else:
             lines_excel[row[0]].append(new_line)
-    families = await family_service.get_families_service(db)
-    for row in ws.iter_rows(
-        min_row=2,
-        min_col=1,
-        max_col=5,
-        values_only=True
-    ):
-        if all(value is None for value in row):
-            continue
-        if row[0] is None or row[1] is None or row[2] is None or row[3] is None or row[4] is None:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail='The excel file is incorrect'
-            )
-        state_value = None
-        if row[3] not in ['Espera', 'Notificado', 'Entregado']:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail='The excel file is incorrect'
-            )
-        else:
-            if row[3] == 'Espera':
-                state_value = model.State.NEXT
-            elif row[3] == 'Notificado':
-                state_value = model.State.NOTIFIED
-            else:
-                state_value = model.State.DELIVERED
-        family = next(
-            (f for f in families if row[4] in [m.nid for m in f.members]),
-            None
+    progress.row = None
+    return lines_excel, updated_products
+
+
+async def import_deliveries_excel(db: DataBaseDep, content: bytes, progress: ImportProgress) -> None:
+    line_rows, delivery_rows = await asyncio.to_thread(parse_deliveries_excel, content, progress)
+    # Solo se leen los almacenes y productos que aparecen en el excel
+    warehouses = {
+        w.name: w for w in await product_service.get_warehouses_service(
+            db,
+            query={'name': {'$in': list({str(row[1]) for _, row in line_rows})}}
         )
-        if family is None:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=(
-                    "Family with family's head"
-                    f"identifer {row[4]} not found"
-                )
+    }
+    products = await product_service.get_products_service(
+        db,
+        query={
+            'warehouse_id': {'$in': [w.id for w in warehouses.values()]},
+            'name': {'$in': list({row[2] for _, row in line_rows})}
+        }
+    )
+    product_by_id = {p.id: p for p in products}
+    product_by_name = {(p.warehouse_id, p.name): p for p in products}
+    lines_excel, updated_products = await asyncio.to_thread(
+        build_delivery_lines_excel,
+        line_rows,
+        progress,
+        warehouses,
+        product_by_name
+    )
+    # Solo se leen las familias de los NID del excel, y de ellas solo los miembros
+    family_nids = list({row[4] for (_, row), _ in delivery_rows})
+    family_by_nid: dict[str, UUID4] = {}
+    async for f in family_service.iter_families_service(
+        db,
+        ('members.nid', {'$in': family_nids}),
+        fields=('id', 'members')
+    ):
+        for m in f.members:
+            family_by_nid.setdefault(m.nid, f.id)
+    deliveries_excel: list[model.Delivery] = []
+    for (progress.row, row), state_value in delivery_rows:
+        family_id = family_by_nid.get(row[4])
+        if family_id is None:
+            raise InvalidImportRow(
+                "Family with family's head"
+                f"identifer {row[4]} not found"
             )
+        lines = lines_excel.get(row[0])
+        if lines is None:
+            raise InvalidImportRow(f'Delivery {row[0]} has no lines')
         try:
             new_delivery = model.Delivery(
                 id=uuid4(),
                 date=row[1],
                 months=row[2],
                 state=state_value,
-                lines=lines_excel[row[0]],
-                family_id=family.id
+                lines=lines,
+                family_id=family_id
             )
         except ValidationError as e:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=parse_validation_error(e.errors())
-            )
+            raise InvalidImportRow(parse_validation_error(e.errors()))
         deliveries_excel.append(new_delivery)
-    warehouse_operations = [
-        BulkOperation(
-            bulk_type='UpdateOne',
-            data={'$set': {
-                'products': get_valid_mongo_obj([p.model_dump() for p in u_products])
-            }},
-            query=product_model.Warehouse.prepare_query(
-                {'id': w_id}
-            )
-        )
-        for w_id, u_products in updated_products.items()
-    ]
+    progress.row = None
     deliveries_operations = [
         BulkOperation(
             bulk_type='InsertOne',
@@ -508,7 +463,22 @@ async def upload_excel_deliveries_controller(db: DataBaseDep, deliveries: Upload
         )
         for d in deliveries_excel
     ]
-    if len(deliveries_operations) > 0:
-        await service.bulk_service(db, operations=deliveries_operations, ordered=False)
-    if len(warehouse_operations) > 0:
-        await product_service.bulk_service(db, operations=warehouse_operations, ordered=False)
+    # Las entregas se escriben antes de descontar el stock; si algo falla se
+    # borran las ya escritas, así nunca queda stock consumido sin su entrega
+    delivery_ids = [d.id for d in deliveries_excel]
+    try:
+        await write_in_batches(
+            progress,
+            deliveries_operations,
+            lambda batch: service.bulk_service(db, operations=batch, ordered=False)
+        )
+    except BaseException:
+        await service.delete_deliveries_service(db, delivery_ids)
+        raise
+    failures = await product_service.apply_stock_movements_service(
+        db,
+        {product_id: -quantity for product_id, quantity in updated_products.items()}
+    )
+    if len(failures) > 0:
+        await service.delete_deliveries_service(db, delivery_ids)
+        raise_stock_failures(failures, product_by_id)
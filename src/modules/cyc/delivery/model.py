@@ -1,9 +1,11 @@
 from enum import Enum
 from typing import Optional
-from datetime import datetime
-from pydantic import BaseModel, UUID4, PositiveInt, FutureDatetime, NonNegativeInt
+from pydantic import BaseModel, UUID4, PositiveInt, FutureDatetime, NonNegativeInt, SerializeAsAny
+from pymongo import ASCENDING, IndexModel
 
 from src.core.database.base_crud import BaseMongo
+from src.core.database.codecs import NaiveUTCDatetime
+from src.core.database.projection import PartialDocument
 
 
 class State(Enum):
@@ -24,8 +26,15 @@ class DeliveryLineOut(DeliveryLine):
 
 
 class Delivery(BaseMongo):
+    __indexes__ = [
+        IndexModel([('family_id', ASCENDING)]),
+        IndexModel([('date', ASCENDING), ('_id', ASCENDING)]),
+        IndexModel([('state', ASCENDING)]),
+    ]
+    __cursor_sort__ = [('date', ASCENDING), ('_id', ASCENDING)]
+
     id: UUID4
-    date: datetime
+    date: NaiveUTCDatetime
     months: PositiveInt
     state: State
     lines: list[DeliveryLine]
@@ -34,7 +43,7 @@ class Delivery(BaseMongo):
 
 class DeliveryOut(BaseModel):
     id: UUID4
-    date: datetime
+    date: NaiveUTCDatetime
     months: PositiveInt
     state: State
     lines: list[DeliveryLineOut]
@@ -58,5 +67,6 @@ class DeliveryUpdate(BaseModel):
 
 
 class GetDeliveries(BaseModel):
-    elements: list[DeliveryOut]
+    elements: list[DeliveryOut | SerializeAsAny[PartialDocument]]
     total_elements: NonNegativeInt
+    next_cursor: Optional[str] = None
@@ -2,10 +2,12 @@ from typing import Optional
 from datetime import date
 
 from pydantic import UUID4
-from fastapi import APIRouter, status, UploadFile
+from fastapi import APIRouter, status, UploadFile, Query
 
 from src.core.deps import DataBaseDep
+from src.core.utils.streaming import ListFormat
 from src.server import dependencies
+from src.modules.shared.imports.model import ImportJob
 from src.modules.cyc.delivery import controller
 from src.modules.cyc.delivery import model
 
@@ -16,7 +18,10 @@ router = APIRouter(tags=["Delivery"], dependencies=dependencies)
             status_code=status.HTTP_200_OK,
             response_model=model.GetDeliveries,
             responses={
-                200: {"description": "Successful Response"},
+                200: {
+                    "description": "Successful Response",
+                    "content": {"application/x-ndjson": {}}
+                },
                 500: {"description": "Internal Server Error"}
             })
 async def get_deliveries(
@@ -26,7 +31,11 @@ async def get_deliveries(
     state: Optional[model.State] = None,
     family: Optional[UUID4] = None,
     limit: int = 100,
-    offset: int = 0
+    offset: int = 0,
+    estimated_count: bool = False,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    response_format: ListFormat = Query(ListFormat.JSON, alias='format')
 ):
     """
     **Retrieve a list of all deliveries.**
@@ -34,11 +43,23 @@ async def get_deliveries(
     Queries the database and returns a list containing every delivery, with each delivery detailing
     its ID, date scheduled for, duration in months, items (lines) including product ID, quantity,
     and state (if any), and the family ID associated with the delivery.
+
+    total_elements is the number of deliveries matching the filters. When no filter is given,
+    estimated_count returns the collection estimate instead of an exact count.
+
+    Passing cursor (empty for the first page) sorts the deliveries by date and pages with
+    the next_cursor of each response instead of offset.
+
+    fields takes a comma separated list of delivery fields (e.g. "date,state") and returns
+    only those plus the id; product names are only looked up when lines is requested.
+
+    With format=ndjson the deliveries of the page are streamed one per line as they are
+    read, without the total_elements envelope.
     """
     return await controller.get_deliveries_controller(
         db,
         before_date, after_date, state, family,
-        limit, offset
+        limit, offset, estimated_count, cursor, fields, response_format
     )
 
 
@@ -90,35 +111,48 @@ async def create_delivery(db: DataBaseDep, delivery: model.DeliveryCreate):
 
 @router.post(
     '/excel',
-    status_code=status.HTTP_204_NO_CONTENT,
-    response_model=None,
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=ImportJob,
     responses={
-        200: {"description": "Deliveries in excel created successfully"},
+        202: {"description": "Import of the excel started"},
         400: {"description": "The data was incorrect"},
-        404: {"description": "Not found"},
     }
 )
 async def upload_excel_delivery(db: DataBaseDep, deliveries: UploadFile):
+    """
+    **Import deliveries from an excel file.**
+
+    Checks the file extension and returns an import job right away; the rows are read
+    and written in the background. Poll `shared/imports/{job_id}` to follow the job.
+    """
     return await controller.upload_excel_deliveries_controller(db, deliveries)
 
 
 @router.get('/family/{family_id}',
             status_code=status.HTTP_200_OK,
-            response_model=list[model.DeliveryOut],
+            response_model=model.GetDeliveries,
             responses={
                 200: {"description": "Successful Response"},
                 404: {"description": "There are no deliveries for this family"},
                 500: {"description": "Internal Server Error"}
             })
-async def get_family_deliveries_details(db: DataBaseDep, family_id: UUID4):
+async def get_family_deliveries_details(
+    db: DataBaseDep,
+    family_id: UUID4,
+    limit: int = 100,
+    offset: int = 0,
+    cursor: Optional[str] = None
+):
     """
     **Get deliveries information about a specific family.**
 
-    Fetches and returns detailed information about deliveries identified a list.
-    Each element includes the delivery's ID, the scheduled date, duration in months, item lines
-    with product ID, quantity, state (if specified) and the associated family ID.
+    Fetches and returns a page of the deliveries of the family, together with the total
+    number of deliveries it has. Each element includes the delivery's ID, the scheduled
+    date, duration in months, item lines with product ID, quantity, state (if specified)
+    and the associated family ID. As in the deliveries list, a cursor switches to keyset
+    pagination ordered by date.
     """
-    return await controller.get_family_deliveries_controller(db, family_id)
+    return await controller.get_family_deliveries_controller(db, family_id, limit, offset, cursor)
 
 
 @router.patch('/{delivery_id}',
@@ -1,13 +1,15 @@
-from typing import Any
+from typing import Any, AsyncIterator, Optional
 
 from fastapi import HTTPException, status
+from pydantic import UUID4
 
 from src.core.deps import DataBaseDep
 from src.core.database.base_crud import BulkOperation
 from src.core.database.mongo_types import InsertOneResultMongo, BulkWriteResult
-from src.core.utils.helpers import get_all_combinations
+from src.core.database.filters import compile_filters
+from src.core.database.projection import PartialDocument
 from src.modules.cyc.delivery import model
-from src.modules.cyc.warehouse import service as warehouse_service, model as warehouse_model
+from src.modules.cyc.warehouse import service as warehouse_service
 
 
 async def get_deliveries_service(
@@ -15,22 +17,58 @@ async def get_deliveries_service(
     *args: Any,
     **kwargs: Any
 ) -> list[model.Delivery]:
-    query_combinations = get_all_combinations(args)
-    query: dict = None
-    for combination in query_combinations:
-        if any(c[1] is None for c in combination):
-            continue
-        query = {c[0]: c[1] for c in combination}
-        date_queries = [c for c in combination if c[0] == 'date']
-        if len(date_queries) == 2:
-            query['date'] = dict(
-                date_queries[0][1], **date_queries[1][1]
-            )
+    query = compile_filters(args)
     return await model.Delivery.get_multi(db, query=query, **kwargs)
 
 
-async def get_delivery_service(db: DataBaseDep, query: dict) -> model.Delivery | None:
-    return await model.Delivery.get(db, query)
+async def get_deliveries_page_service(
+    db: DataBaseDep,
+    *args: Any,
+    limit: int = 100,
+    offset: int = 0,
+    estimated_count: bool = False,
+    cursor: Optional[str] = None,
+    fields: Optional[tuple[str, ...]] = None,
+    construct: bool = False,
+) -> tuple[list[model.Delivery | PartialDocument], int, Optional[str]]:
+    return await model.Delivery.get_page(
+        db,
+        query=compile_filters(args),
+        limit=limit,
+        skip=offset,
+        estimated_count=estimated_count,
+        cursor=cursor,
+        fields=fields,
+        construct=construct
+    )
+
+
+def iter_deliveries_page_service(
+    db: DataBaseDep,
+    *args: Any,
+    limit: int = 100,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    fields: Optional[tuple[str, ...]] = None,
+    construct: bool = False,
+) -> AsyncIterator[model.Delivery | PartialDocument]:
+    return model.Delivery.iter_page(
+        db,
+        query=compile_filters(args),
+        limit=limit,
+        skip=offset,
+        cursor=cursor,
+        fields=fields,
+        construct=construct
+    )
+
+
+async def get_delivery_service(
+    db: DataBaseDep,
+    query: dict,
+    construct: bool = False
+) -> model.Delivery | None:
+    return await model.Delivery.get(db, query, construct=construct)
 
 
 async def create_delivery_service(
@@ -72,39 +110,23 @@ async def delete_delivery_service(db: DataBaseDep, query: dict) -> None:
             detail='Delivery not found'
         )
     if delivery.state != model.State.DELIVERED:
-        warehouses = await warehouse_service.get_warehouses_service(db, query=None)
-        product_to_warehouse = {
-            product.id: (
-                warehouse,
-                product) for warehouse in warehouses for product in warehouse.products}
-        product_updates = {}
+        # Los productos borrados desde la entrega no se reponen, como antes
+        existing = await warehouse_service.get_products_service(
+            db,
+            query={'id': {'$in': [line.product_id for line in delivery.lines]}},
+            fields=('id',)
+        )
+        existing_ids = {p.id for p in existing}
+        movements: dict[UUID4, int] = {}
         for line in delivery.lines:
-            if line.product_id in product_to_warehouse:
-                _, product = product_to_warehouse[line.product_id]
-                if product.id not in product_updates:
-                    product_updates[product.id] = product.quantity + \
-                        line.quantity
-                else:
-                    product_updates[product.id] += line.quantity
-        for warehouse in warehouses:
-            updated_products = []
-            for product in warehouse.products:
-                if product.id in product_updates:
-                    updated_quantity = product_updates[product.id]
-                    updated_product = warehouse_model.Product(
-                        id=product.id,
-                        name=product.name,
-                        quantity=updated_quantity,
-                        exp_date=product.exp_date
-                    )
-                else:
-                    updated_product = product
-                updated_products.append(updated_product.model_dump())
-
-            await warehouse_service.update_warehouse_service(
-                db,
-                warehouse_id=warehouse.id,
-                warehouse_update={'products': updated_products}
+            if line.product_id in existing_ids:
+                movements[line.product_id] = movements.get(line.product_id, 0) + line.quantity
+        failures = await warehouse_service.apply_stock_movements_service(db, movements)
+        if len(failures) > 0:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail='Products ' + ', '.join(str(f.product_id) for f in failures) +
+                ' were deleted during the deletion of the delivery, try again'
             )
 
     mongo_delete = await model.Delivery.delete(db, query)
@@ -115,8 +137,14 @@ async def delete_delivery_service(db: DataBaseDep, query: dict) -> None:
         )
 
 
-async def count_deliveries_service(db: DataBaseDep, query: dict) -> int:
-    return await model.Delivery.count(db, query)
+async def delete_deliveries_service(db: DataBaseDep, delivery_ids: list[UUID4]) -> None:
+    # Borra las entregas sin reponer stock, para deshacer una importación
+    mongo_delete = await model.Delivery.delete(db, {'id': {'$in': delivery_ids}}, many=True)
+    if not mongo_delete.acknowledged:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail='DB error during deletion'
+        )
 
 
 async def bulk_service(db: DataBaseDep, operations: list[BulkOperation], **kwargs: Any):
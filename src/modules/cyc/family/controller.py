@@ -1,17 +1,26 @@
 import re
 import os
+import asyncio
 from uuid import uuid4
-from typing import Optional
+from typing import Any, Optional
 
-import openpyxl
 from fastapi import HTTPException, status, UploadFile
+from fastapi.responses import Response
 from pydantic import UUID4, ValidationError
 
 from src.core.deps import DataBaseDep
 from src.core.database.base_crud import BulkOperation
 from src.core.utils.helpers import parse_validation_error
+from src.core.utils.excel import ExcelRow, iter_excel_rows
+from src.core.database.projection import parse_fields
+from src.core.utils.responses import model_response
+from src.core.utils.streaming import ListFormat, ndjson_response
 from src.modules.cyc.family import model
 from src.modules.cyc.family import service
+from src.modules.shared.imports.model import ImportJob, ImportRowError, InvalidImportRow
+from src.modules.shared.imports.service import (
+    ImportProgress, create_import_job_service, validate_in_processes, write_in_batches
+)
 
 
 async def get_families_controller(
@@ -20,10 +29,14 @@ async def get_families_controller(
     referred_organization: Optional[str],
     name: Optional[str],
     limit=100,
-    offset=0
-) -> model.GetFamilies:
-    families = await service.get_families_service(
-        db,
+    offset=0,
+    estimated_count=False,
+    cursor=None,
+    fields=None,
+    response_format=ListFormat.JSON
+) -> Response:
+    fields = parse_fields(model.Family, fields)
+    filters = (
         ('derecognition_state', state.value if state is not None else state),
         (
             'referred_organization', {
@@ -35,25 +48,45 @@ async def get_families_controller(
                 '$regex': re.compile(f'^{name}', re.IGNORECASE)
             } if name is not None else name
         ),
+    )
+    if response_format == ListFormat.NDJSON:
+        return await ndjson_response(service.iter_families_page_service(
+            db,
+            *filters,
+            limit=limit,
+            offset=offset,
+            cursor=cursor,
+            fields=fields
+        ))
+    families, total_elements, next_cursor = await service.get_families_page_service(
+        db,
+        *filters,
         limit=limit,
-        skip=offset
+        offset=offset,
+        estimated_count=estimated_count,
+        cursor=cursor,
+        fields=fields
     )
-    return model.GetFamilies(
+    return model_response(model.GetFamilies(
         elements=families,
-        total_elements=await service.count_families_service(db, query={})
-    )
+        total_elements=total_elements,
+        next_cursor=next_cursor
+    ))
 
 
 async def create_family_controller(db: DataBaseDep, family: model.FamilyCreate) -> model.Family:
     if family.members is not None:
-        persons = await service.get_members_service(db)
-        for m in family.members:
-            if m.nid is not None and any(
-                    person.nid == m.nid for person in persons):
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f'There is already a person with this NID: {m.nid}',
-                )
+        nids = [m.nid for m in family.members if m.nid is not None]
+        # Basta con una familia que ya tenga alguno de los NID, usa el indice de members.nid
+        existing = await service.get_family_service(
+            db, query={'members.nid': {'$in': nids}}
+        ) if len(nids) > 0 else None
+        if existing is not None:
+            nid = next(m.nid for m in existing.members if m.nid in nids)
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f'There is already a person with this NID: {nid}',
+            )
     # TENGO QUE ELIMINAR PASSPORT FIELD DE PERSON
     new_family = family.model_dump()
     for member in new_family['members']:
@@ -185,7 +218,7 @@ async def delete_person_controller(db: DataBaseDep, family_id: UUID4, person_nid
     )
 
 
-async def upload_excel_families_controller(db: DataBaseDep, families: UploadFile) -> None:
+async def upload_excel_families_controller(db: DataBaseDep, families: UploadFile) -> ImportJob:
     [_, extension] = os.path.splitext(families.filename)
     if extension[1:] not in ['xlsx', 'xlsm']:
         raise HTTPException(
@@ -195,6 +228,10 @@ async def upload_excel_families_controller(db: DataBaseDep, families: UploadFile
                 f'"{extension[1:]}" are not supported.'
             )
         )
+    return await create_import_job_service(db, 'families', families, import_families_excel)
+
+
+def read_families_excel(content: bytes) -> list[tuple[ExcelRow, list[ExcelRow]]]:
     fields_familie_excel = [
         'numero familia', 'nombre', 'numero telefono', 'direccion',
         'fecha renovacion', 'estado', 'organizacion referida', 'observacion'
@@ -211,137 +248,126 @@ async def upload_excel_families_controller(db: DataBaseDep, families: UploadFile
         'diversidad funcional',
         'intolerancia alimenticia',
         'sin hogar']
-    wb = openpyxl.load_workbook(families.file)
-    ws = wb.active
-    first_row_familie = [
-        ws.cell(row=1, column=i).value
-        for i in range(1, len(fields_familie_excel) + 1)
+    persons_excel: dict[Any, list[ExcelRow]] = {}
+    for row in iter_excel_rows(content, fields_person_excel, min_col=10):
+        persons_excel.setdefault(row.values[0], []).append(row)
+    return [
+        (row, persons_excel.get(row.values[0], []))
+        for row in iter_excel_rows(content, fields_familie_excel)
     ]
-    first_row_person = [
-        ws.cell(row=1, column=i).value
-        for i in range(10, 9 + len(fields_person_excel) + 1)
-    ]
-    if not all(
-        field in fields_familie_excel for field in first_row_familie
-    ) and not all(
-        field in fields_person_excel for field in first_row_person
-    ):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail='The excel file is incorrect'
+
+
+def build_person_excel(row: tuple) -> model.PersonCreate:
+    if row[0] is None or row[1] is None or row[4] is None or row[7] is None:
+        raise InvalidImportRow('The excel file is incorrect')
+    if row[7] not in ['Hombre', 'Mujer']:
+        raise InvalidImportRow('The excel file is incorrect')
+    parsed_nid: str | None = row[5]
+    is_passport = False
+    if parsed_nid is not None and parsed_nid.startswith('P-'):
+        parsed_nid = parsed_nid[2:]
+        is_passport = True
+    is_family_head = False
+    if row[6] is not None:
+        is_family_head = True
+    has_functional_diversity = False
+    if row[8] is not None:
+        has_functional_diversity = True
+    food_intolerances: list[str] = []
+    if row[9] is not None:
+        intolerances: str = row[9]
+        food_intolerances = intolerances.split(',')
+    is_homeless = False
+    if row[10] is not None:
+        is_homeless = True
+    try:
+        new_person = model.PersonCreate(
+            date_birth=row[1],
+            name=row[2],
+            surname=row[3],
+            nationality=row[4],
+            nid=parsed_nid,
+            family_head=is_family_head,
+            gender='Man' if row[7] == 'Hombre' else 'Woman',
+            functional_diversity=has_functional_diversity,
+            food_intolerances=food_intolerances,
+            homeless=is_homeless,
+            passport=is_passport
         )
-    persons_excel: dict[int, list[model.PersonCreate]] = {}
-    families_excel: list[model.Family] = []
-    for row in ws.iter_rows(
-        min_row=2,
-        min_col=10,
-        max_col=20,
-        values_only=True
-    ):
-        if all(value is None for value in row):
-            continue
-        if row[0] is None or row[1] is None or row[4] is None or row[7] is None:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail='The excel file is incorrect'
-            )
-        if row[7] not in ['Hombre', 'Mujer']:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail='The excel file is incorrect'
-            )
-        parsed_nid: str | None = row[5]
-        is_passport = False
-        if parsed_nid is not None and parsed_nid.startswith('P-'):
-            parsed_nid = parsed_nid[2:]
-            is_passport = True
-        is_family_head = False
-        if row[6] is not None:
-            is_family_head = True
-        has_functional_diversity = False
-        if row[8] is not None:
-            has_functional_diversity = True
-        food_intolerances: list[str] = []
-        if row[9] is not None:
-            intolerances: str = row[9]
-            food_intolerances = intolerances.split(',')
-        is_homeless = False
-        if row[10] is not None:
-            is_homeless = True
-        try:
-            new_person = model.PersonCreate(
-                date_birth=row[1],
-                name=row[2],
-                surname=row[3],
-                nationality=row[4],
-                nid=parsed_nid,
-                family_head=is_family_head,
-                gender='Man' if row[7] == 'Hombre' else 'Woman',
-                functional_diversity=has_functional_diversity,
-                food_intolerances=food_intolerances,
-                homeless=is_homeless,
-                passport=is_passport
-            )
-        except ValidationError as e:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=parse_validation_error(e.errors())
-            )
-        if (row[0] not in persons_excel):
-            persons_excel[row[0]] = [new_person]
-        else:
-            persons_excel[row[0]].append(new_person)
-    for row in ws.iter_rows(
-        min_row=2,
-        min_col=1,
-        max_col=8,
-        values_only=True
-    ):
-        if all(value is None for value in row):
-            continue
-        if row[0] is None or row[1] is None or row[2] is None or row[3] is None or row[5] is None:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail='The excel file is incorrect'
-            )
-        state_value = None
-        if row[5] not in ['Activa', 'Suspendida']:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail='The excel file is incorrect'
-            )
+    except ValidationError as e:
+        raise InvalidImportRow(parse_validation_error(e.errors()))
+    return new_person
+
+
+def build_family_excel(row: tuple, persons: list[model.PersonCreate]) -> model.Family:
+    if row[0] is None or row[1] is None or row[2] is None or row[3] is None or row[5] is None:
+        raise InvalidImportRow('The excel file is incorrect')
+    state_value = None
+    if row[5] not in ['Activa', 'Suspendida']:
+        raise InvalidImportRow('The excel file is incorrect')
+    else:
+        if row[5] == 'Activa':
+            state_value = model.DerecognitionStatus.ACTIVE
         else:
-            if row[5] == 'Activa':
-                state_value = model.DerecognitionStatus.ACTIVE
-            else:
-                state_value = model.DerecognitionStatus.SUSPENDED
+            state_value = model.DerecognitionStatus.SUSPENDED
+    try:
+        new_family = model.Family(
+            id=uuid4(),
+            name=row[1],
+            phone=str(row[2]),
+            address=row[3],
+            next_renewal_date=row[4],
+            derecognition_state=state_value,
+            referred_organization=row[6],
+            observation=row[7],
+            members=[
+                model.Person(**p.model_dump(exclude=['passport']))
+                for p in persons
+            ]
+        )
+    except ValidationError as e:
+        raise InvalidImportRow(parse_validation_error(e.errors()))
+    return new_family
+
+
+def validate_families_excel(
+    families: list[tuple[ExcelRow, list[ExcelRow]]]
+) -> tuple[list[dict], list[ImportRowError]]:
+    # Se ejecuta en un proceso aparte, devuelve los documentos ya listos para insertar
+    families_excel: list[dict] = []
+    errors: list[ImportRowError] = []
+    for family_row, person_rows in families:
+        row_number = family_row.number
         try:
-            new_family = model.Family(
-                id=uuid4(),
-                name=row[1],
-                phone=str(row[2]),
-                address=row[3],
-                next_renewal_date=row[4],
-                derecognition_state=state_value,
-                referred_organization=row[6],
-                observation=row[7],
-                members=[
-                    model.Person(**p.model_dump(exclude=['passport']))
-                    for p in persons_excel[row[0]]
-                ]
-            )
+            persons = []
+            for row_number, row in person_rows:
+                persons.append(build_person_excel(row))
+            row_number = family_row.number
+            families_excel.append(build_family_excel(family_row.values, persons).mongo())
+        except (InvalidImportRow, HTTPException) as e:
+            # Los validadores del modelo lanzan HTTPException, que no se puede
+            # devolver desde el proceso, así que se convierte aquí en un error de fila
+            errors.append(ImportRowError(row=row_number, detail=str(e.detail)))
         except ValidationError as e:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=parse_validation_error(e.errors())
-            )
-        families_excel.append(new_family)
+            errors.append(ImportRowError(row=row_number, detail=str(parse_validation_error(e.errors()))))
+    return families_excel, errors
+
+
+async def import_families_excel(db: DataBaseDep, content: bytes, progress: ImportProgress) -> None:
+    families_rows = await asyncio.to_thread(read_families_excel, content)
+    families_excel, errors = await validate_in_processes(validate_families_excel, families_rows)
+    if len(errors) > 0:
+        progress.errors += errors
+        return
     families_operations = [
         BulkOperation(
             bulk_type='InsertOne',
-            data=f.mongo()
+            data=f
         )
         for f in families_excel
     ]
-    if len(families_operations) > 0:
-        await service.bulk_service(db, operations=families_operations, ordered=False)
+    await write_in_batches(
+        progress,
+        families_operations,
+        lambda batch: service.bulk_service(db, operations=batch, ordered=False)
+    )
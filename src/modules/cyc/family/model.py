@@ -1,7 +1,10 @@
-from src.core.utils.helpers import check_nid, calculate_age
+from src.core.utils.helpers import calculate_age
+from src.core.utils.validators import check_nid
 from src.core.database.base_crud import BaseMongo
+from src.core.database.projection import PartialDocument
 from fastapi import HTTPException, status
 from sys import maxsize
+from pymongo import ASCENDING, IndexModel
 from typing import Optional, Dict, Literal, Self
 from enum import Enum
 from datetime import date
@@ -12,6 +15,7 @@ from pydantic import (
     NonNegativeInt,
     UUID4,
     BaseModel,
+    SerializeAsAny,
     model_validator,
 )
 
@@ -130,6 +134,12 @@ class FamilyValidator:
 
 
 class Family(BaseMongo, FamilyValidator):
+    __indexes__ = [
+        IndexModel([('members.nid', ASCENDING)]),
+        IndexModel([('name', ASCENDING), ('_id', ASCENDING)]),
+    ]
+    __cursor_sort__ = [('name', ASCENDING), ('_id', ASCENDING)]
+
     id: UUID4
     name: str
     phone: str
@@ -229,5 +239,6 @@ class FamilyUpdate(BaseModel, FamilyValidator):
 
 
 class GetFamilies(BaseModel):
-    elements: list[Family]
+    elements: list[Family | SerializeAsAny[PartialDocument]]
     total_elements: NonNegativeInt
+    next_cursor: Optional[str] = None
@@ -1,10 +1,12 @@
 from typing import Optional
 
-from fastapi import APIRouter, status, UploadFile
+from fastapi import APIRouter, status, UploadFile, Query
 from pydantic import UUID4
 
 from src.core.deps import DataBaseDep
+from src.core.utils.streaming import ListFormat
 from src.server import dependencies
+from src.modules.shared.imports.model import ImportJob
 from src.modules.cyc.family import controller
 from src.modules.cyc.family import model
 
@@ -15,7 +17,10 @@ router = APIRouter(tags=['Family'], dependencies=dependencies)
             status_code=status.HTTP_200_OK,
             response_model=model.GetFamilies,
             responses={
-                200: {"description": "Successful Response"},
+                200: {
+                    "description": "Successful Response",
+                    "content": {"application/x-ndjson": {}}
+                },
                 500: {"description": "Internal Server Error"}
             })
 async def get_families(
@@ -24,15 +29,33 @@ async def get_families(
     referred_organization: Optional[str] = None,
     name: Optional[str] = None,
     limit: int = 100,
-    offset: int = 0
+    offset: int = 0,
+    estimated_count: bool = False,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    response_format: ListFormat = Query(ListFormat.JSON, alias='format')
 ):
     """
     **Retrieve a list of all families.**
 
     Queries the database and returns a list of all families. Each family includes
     details such as the family ID, name, and related information.
+
+    total_elements counts the families matching the filters. Pass estimated_count to get a
+    cheaper estimate when listing every family without filters.
+
+    To page through the families by name, send an empty cursor and then the next_cursor
+    returned with each page.
+
+    Use fields, e.g. fields=name,phone, to receive just those attributes of each family
+    along with its id.
+
+    Large exports can ask for format=ndjson: each family is written on its own line as soon
+    as it is read, and no total is computed.
     """
-    return await controller.get_families_controller(db, state, referred_organization, name, limit, offset)
+    return await controller.get_families_controller(
+        db, state, referred_organization, name, limit, offset, estimated_count, cursor, fields, response_format
+    )
 
 
 @router.post('',
@@ -55,14 +78,20 @@ async def create_family(db: DataBaseDep, family: model.FamilyCreate):
 
 @router.post(
     '/excel',
-    status_code=status.HTTP_204_NO_CONTENT,
-    response_model=None,
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=ImportJob,
     responses={
-        200: {"description": "Families in excel created successfully"},
+        202: {"description": "Import of the excel started"},
         400: {"description": "The data was incorrect"},
     }
 )
 async def upload_excel_families(db: DataBaseDep, families: UploadFile):
+    """
+    **Import families from an excel file.**
+
+    Checks the file extension and returns an import job right away; the rows are read
+    and written in the background. Poll `shared/imports/{job_id}` to follow the job.
+    """
     return await controller.upload_excel_families_controller(db, families)
 
 
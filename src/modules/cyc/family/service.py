@@ -1,12 +1,13 @@
-from typing import Any
+from typing import Any, AsyncIterator, Optional
 
 from pydantic import UUID4
 from fastapi import HTTPException, status
 
 from src.core.deps import DataBaseDep
 from src.core.database.base_crud import BulkOperation
-from src.core.utils.helpers import get_all_combinations
 from src.core.database.mongo_types import InsertOneResultMongo, DeleteResultMongo, BulkWriteResult
+from src.core.database.filters import compile_filters
+from src.core.database.projection import PartialDocument
 from src.modules.cyc.family import model
 
 
@@ -15,19 +16,62 @@ async def get_families_service(
     *args: Any,
     **kwargs: Any
 ) -> list[model.Family]:
-    query_combinations = get_all_combinations(args)
-    query = None
-    for combination in query_combinations:
-        if any(c[1] is None for c in combination):
-            continue
-        query = {c[0]: c[1] for c in combination}
+    query = compile_filters(args)
     return await model.Family.get_multi(db=db, query=query, **kwargs)
 
 
+def iter_families_service(
+    db: DataBaseDep,
+    *args: Any,
+    **kwargs: Any
+) -> AsyncIterator[model.Family | PartialDocument]:
+    return model.Family.iter(db, query=compile_filters(args), **kwargs)
+
+
+async def get_families_page_service(
+    db: DataBaseDep,
+    *args: Any,
+    limit: int = 100,
+    offset: int = 0,
+    estimated_count: bool = False,
+    cursor: Optional[str] = None,
+    fields: Optional[tuple[str, ...]] = None,
+) -> tuple[list[model.Family | PartialDocument], int, Optional[str]]:
+    return await model.Family.get_page(
+        db,
+        query=compile_filters(args),
+        limit=limit,
+        skip=offset,
+        estimated_count=estimated_count,
+        cursor=cursor,
+        fields=fields
+    )
+
+
+def iter_families_page_service(
+    db: DataBaseDep,
+    *args: Any,
+    limit: int = 100,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    fields: Optional[tuple[str, ...]] = None,
+) -> AsyncIterator[model.Family | PartialDocument]:
+    return model.Family.iter_page(
+        db,
+        query=compile_filters(args),
+        limit=limit,
+        skip=offset,
+        cursor=cursor,
+        fields=fields
+    )
+
+
 async def get_members_service(db: DataBaseDep, query: dict = None) -> list[model.Person]:
-    families: list[model.Family] = await model.Family.get_multi(db, query)
-    result = [member for family in families for member in family.members]
-    return result
+    return [
+        member
+        async for family in model.Family.iter(db, query, fields=('id', 'members'))
+        for member in family.members
+    ]
 
 
 async def get_family_service(db: DataBaseDep, query: dict) -> model.Family | None:
@@ -74,10 +118,6 @@ async def update_family_service(
     )
 
 
-async def count_families_service(db: DataBaseDep, query: dict) -> int:
-    return await model.Family.count(db, query)
-
-
 async def bulk_service(db: DataBaseDep, operations: list[BulkOperation], **kwargs: Any):
     result: BulkWriteResult = await model.Family.bulk_operation(
         db,
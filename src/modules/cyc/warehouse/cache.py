@@ -0,0 +1,9 @@
+from src.core.config import settings
+from src.core.utils.cache import TTLCache
+
+# Producto -> (nombre, nombre del almacén), usado para completar las líneas de
+# las entregas sin consultar la base de datos en cada petición
+product_catalog = TTLCache(
+    maxsize=settings.PRODUCT_CATALOG_CACHE_SIZE,
+    ttl=settings.PRODUCT_CATALOG_CACHE_TTL_SECONDS
+)
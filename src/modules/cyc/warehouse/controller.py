@@ -1,33 +1,53 @@
+import asyncio
 import os
+import re
+from datetime import date
+from typing import Optional
 from uuid import uuid4
 from collections import Counter
 
 from fastapi import HTTPException, status, UploadFile
-import openpyxl
 from pydantic import UUID4, ValidationError
 
 from src.core.deps import DataBaseDep
 from src.core.database.base_crud import BulkOperation
-from src.core.utils.helpers import parse_validation_error, get_valid_mongo_obj
+from src.core.utils.helpers import parse_validation_error
+from src.core.utils.excel import iter_excel_rows
 from src.modules.cyc.warehouse import service
 from src.modules.cyc.warehouse import model
+from src.modules.shared.imports.model import ImportJob, InvalidImportRow
+from src.modules.shared.imports.service import (
+    ImportProgress, create_import_job_service, write_in_batches
+)
 
 
-async def get_products_controller(db: DataBaseDep, limit: int = 100, offset: int = 0) -> model.GetProducts:
-    products = await service.get_products_service(db)
-    result = products[offset:offset + limit]
-    return model.GetProducts(
-        elements=result,
-        total_elements=await service.count_products_service(db, query={})
-    )
+async def get_products_controller(
+    db: DataBaseDep,
+    name: Optional[str] = None,
+    warehouse: Optional[UUID4] = None,
+    before_exp_date: Optional[date] = None,
+    after_exp_date: Optional[date] = None,
+    limit: int = 100,
+    offset: int = 0
+) -> model.GetProducts:
+    query = {}
+    if name is not None:
+        query['name'] = {'$regex': f'^{re.escape(name)}'}
+    if warehouse is not None:
+        query['warehouse_id'] = warehouse
+    exp_date = {}
+    if before_exp_date is not None:
+        exp_date['$lte'] = before_exp_date.isoformat()
+    if after_exp_date is not None:
+        exp_date['$gte'] = after_exp_date.isoformat()
+    if len(exp_date) > 0:
+        query['exp_date'] = exp_date
+    products, total = await service.get_products_page_service(db, query, limit, offset)
+    return model.GetProducts(elements=products, total_elements=total)
 
 
 async def get_product_controller(db: DataBaseDep, product_id: UUID4) -> model.ProductOut:
-    products = await service.get_products_service(db)
-    result = next(
-        (p for p in products if p.id == product_id),
-        None
-    )
+    result = await service.get_product_service(db, query={'id': product_id})
     if result is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -36,177 +56,172 @@ async def get_product_controller(db: DataBaseDep, product_id: UUID4) -> model.Pr
     return result
 
 
-async def get_warehouses_controller(db: DataBaseDep) -> list[model.Warehouse]:
-    return await service.get_warehouses_service(db)
+async def get_warehouses_controller(db: DataBaseDep) -> list[model.WarehouseOut]:
+    warehouses = await service.get_warehouses_service(db)
+    return await service.get_warehouses_with_products_service(db, warehouses)
 
 
-async def get_warehouse_controller(db: DataBaseDep, warehouse_id: UUID4) -> model.Warehouse:
-    return await service.get_warehouse_service(db, query={'id': warehouse_id})
+async def get_warehouse_controller(db: DataBaseDep, warehouse_id: UUID4) -> model.WarehouseOut:
+    warehouse = await service.get_warehouse_service(db, query={'id': warehouse_id})
+    if warehouse is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f'Warehouse with id {warehouse_id} not found'
+        )
+    result = await service.get_warehouses_with_products_service(db, [warehouse])
+    return result[0]
 
 
 async def create_product_controller(
     db: DataBaseDep,
     create_products: model.ProductCreate
 ) -> list[model.ProductOut]:
-    result = []
     warehouses_id = [p.warehouse_id for p in create_products.products]
     warehouses = await service.get_warehouses_service(db, query={'id': {'$in': warehouses_id}})
-    products_by_warehouse: dict[UUID4, list[dict]] = {}
+    warehouses_by_id = {w.id: w for w in warehouses}
     products_count = Counter([p.name for p in create_products.products])
     if any(count > 1 for count in products_count.values()):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail='There can not be duplicated products'
         )
+    existing_products = await service.get_products_service(
+        db,
+        query={
+            'warehouse_id': {'$in': warehouses_id},
+            'name': {'$in': list(products_count)}
+        }
+    )
+    existing_names = {(p.warehouse_id, p.name) for p in existing_products}
+    new_products: list[model.Product] = []
     for product in create_products.products:
-        warehouse = next(
-            (w for w in warehouses if w.id if product.warehouse_id),
-            None
-        )
+        warehouse = warehouses_by_id.get(product.warehouse_id)
         if warehouse is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f'Warehouse {product.warehouse_id} not found'
             )
-        if any(p.name == product.name for p in warehouse.products):
+        if (warehouse.id, product.name) in existing_names:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=(f'Product with name {product.name} '
                         f'already exists in warehouse {warehouse.name}')
             )
-        new_product = model.Product(
+        new_products.append(model.Product(
             id=uuid4(),
             name=product.name,
             quantity=product.quantity,
-            exp_date=product.exp_date
-        ).model_dump()
-        if warehouse.id not in products_by_warehouse:
-            products_by_warehouse[warehouse.id] = []
-        products_by_warehouse[warehouse.id].append(new_product)
-        result.append(model.ProductOut(
-            id=new_product['id'],
-            warehouse_id=warehouse.id,
-            name=product.name,
-            quantity=product.quantity,
-            exp_date=product.exp_date
+            exp_date=product.exp_date,
+            warehouse_id=warehouse.id
         ))
-    for key, value in products_by_warehouse.items():
-        warehouse = [w for w in warehouses if w.id == key][0]
-        warehouse_products = [
-            p.model_dump() for p
-            in warehouse.products
-        ]
-        await service.update_warehouse_service(
-            db,
-            warehouse_id=warehouse.id,
-            warehouse_update={'products': warehouse_products + value}
-        )
-    return result
+    if len(new_products) > 0:
+        await service.create_products_service(db, new_products)
+    return new_products
 
 
 async def create_warehouse_controller(
     db: DataBaseDep,
     warehouse: model.WarehouseCreate
-) -> model.Warehouse:
+) -> model.WarehouseOut:
     check_warehouse = await service.get_warehouse_service(db, query={'name': warehouse.name})
     if check_warehouse is not None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail='Warehouse already created'
         )
-    new_warehouse = warehouse.model_dump()
-    products_with_id = [
+    new_warehouse = warehouse.model_dump(exclude=['products'])
+    mongo_insert = await service.create_warehouse_service(db, new_warehouse)
+    products = [
         model.Product(
             id=uuid4(),
             name=p.name,
             quantity=p.quantity,
-            exp_date=p.exp_date
+            exp_date=p.exp_date,
+            warehouse_id=mongo_insert.inserted_id
         ) for p in warehouse.products
     ]
-    new_warehouse['products'] = products_with_id
-    mongo_insert = await service.create_warehouse_service(db, new_warehouse)
-    result = await service.get_warehouse_service(db, query={'id': mongo_insert.inserted_id})
-    return result
+    if len(products) > 0:
+        await service.create_products_service(db, products)
+    return await get_warehouse_controller(db, mongo_insert.inserted_id)
 
 
 async def update_warehouse_controller(
     db: DataBaseDep,
     warehouse_id: UUID4,
     update_warehouse: model.WarehouseUpdate
-) -> model.Warehouse:
-    update_data = update_warehouse.model_dump()
+) -> model.WarehouseOut:
+    update_data = update_warehouse.model_dump(exclude=['products'])
     for field in update_data.copy():
         if update_data[field] is None:
             update_data.pop(field)
-    result = await service.update_warehouse_service(db, warehouse_id, update_data)
+    if len(update_data) > 0:
+        result = await service.update_warehouse_service(db, warehouse_id, update_data)
+    else:
+        result = await service.get_warehouse_service(db, query={'id': warehouse_id})
     if result is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f'Warehouse with id {warehouse_id} not found'
         )
-    return result
+    if update_warehouse.products is not None:
+        await service.replace_warehouse_products_service(
+            db,
+            warehouse_id=result.id,
+            products=update_warehouse.products
+        )
+    return await get_warehouse_controller(db, result.id)
 
 
 async def update_product_controller(
     db: DataBaseDep,
     update_products: model.ProductUpdate
 ) -> list[model.ProductOut]:
-    result = []
     warehouses_id = [p.warehouse_id for p in update_products.products]
     warehouses = await service.get_warehouses_service(db, query={'id': {'$in': warehouses_id}})
-    products_by_warehouse: dict[UUID4, list[dict]] = {}
+    warehouses_by_id = {w.id: w for w in warehouses}
     product_ids_count = Counter(p.product_id for p in update_products.products)
     if any(value > 1 for value in product_ids_count.values()):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail='There cannot be duplicated products'
         )
+    old_products = await service.get_products_service(
+        db,
+        query={'id': {'$in': list(product_ids_count)}}
+    )
+    old_products_by_id = {p.id: p for p in old_products}
+    updated_products: list[model.Product] = []
+    operations: list[BulkOperation] = []
     for product in update_products.products:
-        warehouse = next(
-            (w for w in warehouses if w.id if product.warehouse_id),
-            None
-        )
+        warehouse = warehouses_by_id.get(product.warehouse_id)
         if warehouse is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f'Warehouse {product.warehouse_id} not found'
             )
-        if product.product_id not in (p.id for p in warehouse.products):
+        old_product = old_products_by_id.get(product.product_id)
+        if old_product is None or old_product.warehouse_id != warehouse.id:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f'Product not found in warehouse {warehouse.name}'
             )
-        old_product = list(filter(
-            lambda p: p.id == product.product_id,
-            warehouse.products
-        )).pop()
         updated_product = model.Product(
             id=product.product_id,
             name=old_product.name if product.name is None else product.name,
-            quantity=old_product.quantity if product.quantity is None else product. quantity,
-            exp_date=product.exp_date if product.update_exp_date else old_product.exp_date)
-        if warehouse.id not in products_by_warehouse:
-            products_by_warehouse[warehouse.id] = []
-        products_by_warehouse[warehouse.id].append(
-            updated_product.model_dump())
-        result.append(model.ProductOut(
-            id=product.product_id,
-            warehouse_id=warehouse.id,
-            name=updated_product.name,
-            quantity=updated_product.quantity,
-            exp_date=updated_product.exp_date
-        ))
-    for key, value in products_by_warehouse.items():
-        warehouse = [w for w in warehouses if w.id == key][0]
-        value_ids = [p['id'] for p in value]
-        await service.update_warehouse_service(
-            db,
-            warehouse_id=warehouse.id,
-            warehouse_update={
-                'products': [p.model_dump() for p in warehouse.products if p.id not in value_ids] + value
-            }
+            quantity=old_product.quantity if product.quantity is None else product.quantity,
+            exp_date=product.exp_date if product.update_exp_date else old_product.exp_date,
+            warehouse_id=warehouse.id
         )
-    return result
+        updated_products.append(updated_product)
+        operation = service.product_update_operation(
+            old_product,
+            updated_product.model_dump(include={'name', 'quantity', 'exp_date'})
+        )
+        if operation is not None:
+            operations.append(operation)
+    if len(operations) > 0:
+        await service.update_products_service(db, operations)
+    return updated_products
 
 
 async def delete_warehouse_controller(db: DataBaseDep, warehouse_id: UUID4) -> None:
@@ -214,23 +229,16 @@ async def delete_warehouse_controller(db: DataBaseDep, warehouse_id: UUID4) -> N
 
 
 async def delete_product_controller(db: DataBaseDep, product_id: UUID4) -> None:
-    products = await service.get_products_service(db)
-    product = next(
-        (p for p in products if p.id == product_id),
-        None
-    )
+    product = await service.get_product_service(db, query={'id': product_id})
     if product is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f'Product {product_id} not found'
         )
-    warehouse: model.Warehouse = await service.get_warehouse_service(db, {'id': product.warehouse_id})
-    new_products = [p.model_dump()
-                    for p in warehouse.products if p.id != product.id]
-    await service.update_warehouse_service(db, warehouse_id=warehouse.id, warehouse_update={'products': new_products})
+    await service.delete_product_service(db, product.id)
 
 
-async def upload_excel_products_controller(db: DataBaseDep, products: UploadFile) -> None:
+async def upload_excel_products_controller(db: DataBaseDep, products: UploadFile) -> ImportJob:
     [_, extension] = os.path.splitext(products.filename)
     if extension[1:] not in ['xlsx', 'xlsm']:
         raise HTTPException(
@@ -240,88 +248,82 @@ async def upload_excel_products_controller(db: DataBaseDep, products: UploadFile
                 f'"{extension[1:]}" are not supported.'
             )
         )
+    return await create_import_job_service(db, 'products', products, import_products_excel)
+
+
+def parse_products_excel(content: bytes, progress: ImportProgress) -> dict[str, list[model.WarehouseProduct]]:
     fields_excel = ['nombre', 'cantidad', 'fecha caducidad', 'almacen']
-    wb = openpyxl.load_workbook(products.file)
-    ws = wb.active
-    first_row = [
-        ws.cell(row=1, column=i).value
-        for i in range(1, len(fields_excel) + 1)
-    ]
-    if len(first_row) != len(fields_excel) and not all(
-            field in fields_excel for field in first_row):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail='The excel file is incorrect'
-        )
-    products_excel: dict[str, model.WarehouseUpdate] = {}
-    for row in ws.iter_rows(min_row=2, min_col=1, max_col=4, values_only=True):
-        if all(value is None for value in row):
-            continue
+    products_excel: dict[str, list[model.WarehouseProduct]] = {}
+    for progress.row, row in iter_excel_rows(content, fields_excel):
         if row[0] is None or row[1] is None or row[3] is None:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail='The excel file is incorrect'
-            )
+            raise InvalidImportRow('The excel file is incorrect')
         warehouse_name: str = str(row[3])
         try:
-            new_product = model.Product(
+            new_product = model.WarehouseProduct(
                 id=uuid4(),
                 name=row[0],
                 quantity=row[1],
                 exp_date=row[2],
             )
         except ValidationError as e:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=parse_validation_error(e.errors())
-            )
+            raise InvalidImportRow(parse_validation_error(e.errors()))
         if warehouse_name not in products_excel:
-            products_excel[warehouse_name] = model.WarehouseUpdate(products=[])
+            products_excel[warehouse_name] = []
         if new_product.name in [
-            p.name for p in products_excel.get(warehouse_name).products
+            p.name for p in products_excel.get(warehouse_name)
         ]:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail='There cannot be duplicated products'
-            )
-        products_excel.get(warehouse_name).products.append(new_product)
-    warehouse_operations: list[BulkOperation] = []
+            raise InvalidImportRow('There cannot be duplicated products')
+        products_excel.get(warehouse_name).append(new_product)
+    progress.row = None
+    return products_excel
+
+
+async def import_products_excel(db: DataBaseDep, content: bytes, progress: ImportProgress) -> None:
+    products_excel = await asyncio.to_thread(parse_products_excel, content, progress)
+    warehouses = await service.get_warehouses_service(
+        db,
+        query={'name': {'$in': list(products_excel)}}
+    )
+    warehouses_by_name = {w.name: w for w in warehouses}
+    existing_products = await service.get_products_service(
+        db,
+        query={
+            'warehouse_id': {'$in': [w.id for w in warehouses]},
+            'name': {'$in': list({p.name for value in products_excel.values() for p in value})}
+        }
+    )
+    existing_by_key = {(p.warehouse_id, p.name): p for p in existing_products}
+    product_operations: list[BulkOperation] = []
+    unchanged_rows = 0
     for key, value in products_excel.items():
-        warehouse = await service.get_warehouse_service(db, query={'name': key})
+        warehouse = warehouses_by_name.get(key)
         if warehouse is None:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f'Warehouse {key} not found'
-            )
-        products_names = [p.name for p in value.products]
-        update_and_old_products: list[dict] = []
-        for product in warehouse.products:
-            if product.name in products_names:
-                new_p = next(
-                    (p for p in value.products if p.name == product.name),
-                    None
+            raise InvalidImportRow(f'Warehouse {key} not found')
+        for product in value:
+            existing_product = existing_by_key.get((warehouse.id, product.name))
+            if existing_product is None:
+                product_operations.append(
+                    BulkOperation(
+                        bulk_type='InsertOne',
+                        data=model.Product(
+                            **product.model_dump(),
+                            warehouse_id=warehouse.id
+                        ).mongo()
+                    )
                 )
-                new_p.id = product.id
-                update_and_old_products.append(
-                    get_valid_mongo_obj(new_p.model_dump()))
-                value.products.remove(new_p)
                 continue
-            update_and_old_products.append(
-                get_valid_mongo_obj(product.model_dump())
-            )
-        new_products = update_and_old_products + [
-            get_valid_mongo_obj(p.model_dump()) for p in value.products
-        ]
-        warehouse_operations.append(
-            BulkOperation(
-                bulk_type='UpdateOne',
-                data={'$set': {'products': new_products}},
-                query=model.Warehouse.prepare_query({'id': warehouse.id})
+            operation = service.product_update_operation(
+                existing_product,
+                product.model_dump(include={'quantity', 'exp_date'})
             )
-        )
-    if len(warehouse_operations) > 0:
-        await service.bulk_service(
-            db,
-            operations=warehouse_operations,
-            ordered=False
-        )
+            if operation is None:
+                unchanged_rows += 1
+                continue
+            product_operations.append(operation)
+    await write_in_batches(
+        progress,
+        product_operations,
+        lambda batch: service.update_products_service(db, operations=batch, ordered=False)
+    )
+    if unchanged_rows > 0:
+        await progress.add_processed_rows(unchanged_rows)
@@ -0,0 +1,46 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase, AsyncIOMotorCollection
+from pymongo import ReplaceOne
+
+from src.modules.cyc.warehouse import model
+
+
+async def migrate_embedded_products(db: AsyncIOMotorDatabase) -> int:
+    """
+    Moves the products embedded in the old Warehouse.products arrays to the
+    Product collection.
+
+    Every product keeps its id and gets the id of its warehouse as warehouse_id.
+    The products array is removed from the warehouse once its products are
+    stored, so running the migration again only touches warehouses that still
+    use the embedded layout.
+
+    Parameters:
+    - db (AsyncIOMotorDatabase): The database to migrate.
+
+    Returns:
+    int: The number of migrated products.
+    """
+    warehouses: AsyncIOMotorCollection = model.Warehouse.get_collection(db)
+    migrated = 0
+    async for warehouse in warehouses.find(
+        {'products': {'$exists': True}},
+        {'products': 1}
+    ):
+        operations = []
+        for product in warehouse['products']:
+            product_id = product.pop('id')
+            operations.append(
+                ReplaceOne(
+                    {'_id': product_id},
+                    dict(product, _id=product_id, warehouse_id=warehouse['_id']),
+                    upsert=True
+                )
+            )
+        if len(operations) > 0:
+            await model.Product.bulk_operation(db, operations, ordered=False)
+        await warehouses.update_one(
+            {'_id': warehouse['_id']},
+            {'$unset': {'products': ''}}
+        )
+        migrated += len(operations)
+    return migrated
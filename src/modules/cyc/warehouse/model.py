@@ -1,11 +1,12 @@
 from typing import Optional
 from datetime import date
 from pydantic import PositiveInt, FutureDate, UUID4, BaseModel, NonNegativeInt
+from pymongo import ASCENDING, IndexModel
 
 from src.core.database.base_crud import BaseMongo
 
 
-class Product(BaseModel):
+class WarehouseProduct(BaseModel):
     id: UUID4
     name: str
     quantity: NonNegativeInt
@@ -18,10 +19,14 @@ class ProductWithoutId(BaseModel):
     exp_date: Optional[date] = None
 
 
-class ProductOut(Product):
+class ProductOut(WarehouseProduct):
     warehouse_id: UUID4
 
 
+class Product(BaseMongo, ProductOut):
+    __indexes__ = [IndexModel([('warehouse_id', ASCENDING), ('name', ASCENDING)])]
+
+
 class WarehouseProductCreate(BaseModel):
     name: str
     exp_date: Optional[FutureDate] = None
@@ -47,9 +52,16 @@ class ProductUpdate(BaseModel):
 
 
 class Warehouse(BaseMongo):
+    __indexes__ = [IndexModel([('name', ASCENDING)], unique=True)]
+
+    id: UUID4
+    name: str
+
+
+class WarehouseOut(BaseModel):
     id: UUID4
     name: str
-    products: list[Product]
+    products: list[WarehouseProduct]
 
 
 class WarehouseCreate(BaseModel):
@@ -59,7 +71,13 @@ class WarehouseCreate(BaseModel):
 
 class WarehouseUpdate(BaseModel):
     name: Optional[str] = None
-    products: list[Product] = None
+    products: list[WarehouseProduct] = None
+
+
+class StockMovementFailure(BaseModel):
+    product_id: UUID4
+    quantity: int
+    available: Optional[NonNegativeInt] = None
 
 
 class GetProducts(BaseModel):
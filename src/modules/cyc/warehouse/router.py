@@ -1,9 +1,13 @@
+from datetime import date
+from typing import Optional
+
 from pydantic import UUID4
 
 from fastapi import APIRouter, status, UploadFile
 
 from src.core.deps import DataBaseDep
 from src.server import dependencies
+from src.modules.shared.imports.model import ImportJob
 from src.modules.cyc.warehouse import controller
 from src.modules.cyc.warehouse import model
 
@@ -13,7 +17,7 @@ router = APIRouter(tags=['Warehouse'], dependencies=dependencies)
 @router.get(
     '',
     status_code=status.HTTP_200_OK,
-    response_model=list[model.Warehouse],
+    response_model=list[model.WarehouseOut],
     responses={
         200: {"description": "Successful Response"},
         500: {"description": "Internal Server Error"}
@@ -38,15 +42,28 @@ async def get_warehouses(db: DataBaseDep):
         500: {"description": "Internal Server Error"}
     }
 )
-async def get_products(db: DataBaseDep, limit: int = 100, offset: int = 0):
+async def get_products(
+    db: DataBaseDep,
+    name: Optional[str] = None,
+    warehouse: Optional[UUID4] = None,
+    before_exp_date: Optional[date] = None,
+    after_exp_date: Optional[date] = None,
+    limit: int = 100,
+    offset: int = 0
+):
     """
     **Retrieve a list of all products in all warehouses.**
 
     Queries the database to return a list of all products across all warehouses,
     including each product's name, quantity, expiration date, and the ID of the warehouse
-    it's stored in.
+    it's stored in. The products can be filtered by a name prefix, by warehouse and
+    by an expiration date window.
     """
-    return await controller.get_products_controller(db, limit, offset)
+    return await controller.get_products_controller(
+        db,
+        name, warehouse, before_exp_date, after_exp_date,
+        limit, offset
+    )
 
 
 @router.get(
@@ -65,9 +82,10 @@ async def get_product(db: DataBaseDep, product_id: UUID4):
 @router.get(
     '/{warehouse_id}',
     status_code=status.HTTP_200_OK,
-    response_model=model.Warehouse,
+    response_model=model.WarehouseOut,
     responses={
         200: {"description": "Successful Response"},
+        404: {"description": "Warehouse not found"},
         500: {"description": "Internal Server Error"}
     }
 )
@@ -84,7 +102,7 @@ async def get_warehouse(db: DataBaseDep, warehouse_id: UUID4):
 @router.post(
     '',
     status_code=status.HTTP_201_CREATED,
-    response_model=model.Warehouse,
+    response_model=model.WarehouseOut,
     responses={
         201: {"description": "Warehouse created successfully"},
         400: {"description": "Bad Request - Warehouse already exists"},
@@ -124,15 +142,20 @@ async def create_product(db: DataBaseDep, product: model.ProductCreate):
 
 @router.post(
     '/product/excel',
-    status_code=status.HTTP_204_NO_CONTENT,
-    response_model=None,
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=ImportJob,
     responses={
-        200: {"description": "Products in excel created successfully"},
-        404: {"description": "Warehouse not found"},
+        202: {"description": "Import of the excel started"},
         400: {"description": "The data was incorrect"},
     }
 )
 async def upload_excel_products(db: DataBaseDep, products: UploadFile):
+    """
+    **Import products from an excel file.**
+
+    Checks the file extension and returns an import job right away; the rows are read
+    and written in the background. Poll `shared/imports/{job_id}` to follow the job.
+    """
     return await controller.upload_excel_products_controller(db, products)
 
 
@@ -197,9 +220,10 @@ async def update_product(db: DataBaseDep, product_update: model.ProductUpdate):
 @router.patch(
     '/{warehouse_id}',
     status_code=status.HTTP_200_OK,
-    response_model=model.Warehouse,
+    response_model=model.WarehouseOut,
     responses={
         200: {"description": "Warehouse successfully updated"},
+        400: {"description": "Bad Request - Warehouse already exists"},
         404: {"description": "Warehouse not found"}
     }
 )
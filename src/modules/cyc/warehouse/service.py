@@ -1,37 +1,131 @@
-from typing import Any
+from typing import Any, AsyncIterator
 from uuid import uuid4
 from pydantic import UUID4
 
 from fastapi import HTTPException, status
 from pymongo import UpdateMany, UpdateOne, InsertOne
+from pymongo.errors import DuplicateKeyError
 
 from src.core.deps import DataBaseDep
-from src.core.database.base_crud import BulkOperation
-from src.core.database.mongo_types import InsertOneResultMongo, DeleteResultMongo, UpdateResult, BulkWriteResult
+from src.core.database.base_crud import BulkOperation, BulkTypes
+from src.core.database.mongo_types import InsertOneResultMongo, DeleteResultMongo, BulkWriteResult
 from src.modules.cyc.warehouse import model
+from src.modules.cyc.warehouse.cache import product_catalog
+
+STOCK_MOVEMENTS_WINDOW = 50
 
 
 async def get_warehouses_service(db: DataBaseDep, query: dict = None) -> list[model.Warehouse]:
     return await model.Warehouse.get_multi(db, query)
 
 
+def iter_warehouses_service(db: DataBaseDep, query: dict = None) -> AsyncIterator[model.Warehouse]:
+    return model.Warehouse.iter(db, query)
+
+
 async def get_warehouse_service(db: DataBaseDep, query: dict) -> model.Warehouse | None:
     return await model.Warehouse.get(db, query)
 
 
-async def get_products_service(db: DataBaseDep, query: dict = None, **kwargs: Any) -> list[model.ProductOut]:
-    warehouses: list[model.Warehouse] = await model.Warehouse.get_multi(db, query, **kwargs)
-    result = [
-        model.ProductOut(
-            id=product.id,
-            name=product.name,
-            quantity=product.quantity,
-            exp_date=product.exp_date,
-            warehouse_id=warehouse.id,
+async def get_products_service(db: DataBaseDep, query: dict = None, **kwargs: Any) -> list[model.Product]:
+    return await model.Product.get_multi(db, query, **kwargs)
+
+
+def iter_products_service(db: DataBaseDep, query: dict = None, **kwargs: Any) -> AsyncIterator[model.Product]:
+    return model.Product.iter(db, query, **kwargs)
+
+
+async def get_product_service(db: DataBaseDep, query: dict) -> model.Product | None:
+    return await model.Product.get(db, query)
+
+
+async def get_products_page_service(
+    db: DataBaseDep,
+    query: dict,
+    limit: int = 100,
+    offset: int = 0,
+) -> tuple[list[model.Product], int]:
+    """
+    Retrieves a page of products and the number of products matching the query
+    in a single aggregation.
+
+    Parameters:
+    - db (AsyncIOMotorDatabase): The database to query.
+    - query (dict): The filter applied to the products before paginating.
+    - limit (int): The maximum number of products to return.
+    - offset (int): The number of matching products to skip.
+
+    Returns:
+    tuple[list[Product], int]: The products of the page and the total number of
+    matching products.
+    """
+    pipeline = [
+        {'$match': model.Product.prepare_query(query)},
+        {
+            '$facet': {
+                'elements': [{'$skip': offset}, {'$limit': limit}],
+                'total_elements': [{'$count': 'count'}],
+            }
+        },
+    ]
+    [result] = await model.Product.aggregate(db, pipeline)
+    total = result['total_elements']
+    return (
+        [model.Product.from_mongo(p) for p in result['elements']],
+        total[0]['count'] if len(total) > 0 else 0
+    )
+
+
+async def get_warehouses_with_products_service(
+    db: DataBaseDep,
+    warehouses: list[model.Warehouse],
+) -> list[model.WarehouseOut]:
+    products: list[model.Product] = await model.Product.get_multi(
+        db,
+        query={'warehouse_id': {'$in': [w.id for w in warehouses]}}
+    )
+    products_by_warehouse: dict[UUID4, list[model.Product]] = {
+        w.id: [] for w in warehouses
+    }
+    for product in products:
+        products_by_warehouse[product.warehouse_id].append(product)
+    return [
+        model.WarehouseOut(
+            id=warehouse.id,
+            name=warehouse.name,
+            products=products_by_warehouse[warehouse.id]
         )
         for warehouse in warehouses
-        for product in warehouse.products
     ]
+
+
+async def get_products_names_service(
+    db: DataBaseDep,
+    product_ids: list[UUID4],
+) -> dict[UUID4, tuple[str, str]]:
+    result = {}
+    missing = []
+    for product_id in set(product_ids):
+        names = product_catalog.get(product_id)
+        if names is None:
+            missing.append(product_id)
+        else:
+            result[product_id] = names
+    if len(missing) == 0:
+        return result
+    products: list[model.Product] = await model.Product.get_multi(
+        db,
+        query={'id': {'$in': missing}}
+    )
+    warehouses: list[model.Warehouse] = await model.Warehouse.get_multi(
+        db,
+        query={'id': {'$in': list({p.warehouse_id for p in products})}}
+    )
+    warehouse_to_name = {w.id: w.name for w in warehouses}
+    for product in products:
+        names = (product.name, warehouse_to_name.get(product.warehouse_id, ''))
+        product_catalog.set(product.id, names)
+        result[product.id] = names
     return result
 
 
@@ -39,14 +133,21 @@ async def create_warehouse_service(
     db: DataBaseDep,
     warehouse: dict
 ) -> InsertOneResultMongo:
-    result: InsertOneResultMongo = await model.Warehouse.create(
-        db, obj_to_create=warehouse
-    )
+    try:
+        result: InsertOneResultMongo = await model.Warehouse.create(
+            db, obj_to_create=warehouse
+        )
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='Warehouse already created'
+        )
     if not result.acknowledged:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail='DB error'
         )
+    product_catalog.clear()
     return result
 
 
@@ -55,25 +156,19 @@ async def update_warehouse_service(
     warehouse_id: UUID4,
     warehouse_update: dict
 ) -> model.Warehouse | None:
-    return await model.Warehouse.update(
-        db,
-        query={'id': warehouse_id},
-        data_to_update=warehouse_update
-    )
-
-
-async def update_many_warehouse_service(
-    db: DataBaseDep,
-    query: dict,
-    warehouse_update: model.WarehouseProductUpdate,
-    **kwargs: Any,
-) -> UpdateResult:
-    return await model.Warehouse.update_many(
-        db,
-        query=query,
-        data_to_update=warehouse_update,
-        **kwargs
-    )
+    try:
+        result = await model.Warehouse.update(
+            db,
+            query={'id': warehouse_id},
+            data_to_update=warehouse_update
+        )
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='Warehouse already created'
+        )
+    product_catalog.clear()
+    return result
 
 
 async def delete_warehouse_service(db: DataBaseDep, warehouse_id: UUID4) -> None:
@@ -83,6 +178,8 @@ async def delete_warehouse_service(db: DataBaseDep, warehouse_id: UUID4) -> None
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail='DB error'
         )
+    await model.Product.delete(db, query={'warehouse_id': warehouse_id}, many=True)
+    product_catalog.clear()
 
 
 async def bulk_service(db: DataBaseDep, operations: list[BulkOperation], **kwargs: Any):
@@ -96,6 +193,7 @@ async def bulk_service(db: DataBaseDep, operations: list[BulkOperation], **kwarg
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail='DB error'
         )
+    product_catalog.clear()
     return result
 
 
@@ -104,25 +202,23 @@ async def bulk_create_service(
     warehouses: list[model.WarehouseCreate],
     **kwargs: Any,
 ) -> BulkWriteResult:
-    warehouses_dict = []
+    warehouses_db: list[model.Warehouse] = []
+    products_db: list[model.Product] = []
     for warehouse in warehouses:
-        products_with_id = [
+        new_warehouse = model.Warehouse(id=uuid4(), name=warehouse.name)
+        warehouses_db.append(new_warehouse)
+        products_db += [
             model.Product(
                 id=uuid4(),
                 name=p.name,
                 quantity=p.quantity,
-                exp_date=p.exp_date
+                exp_date=p.exp_date,
+                warehouse_id=new_warehouse.id
             ) for p in warehouse.products
         ]
-        w = warehouse.model_dump(exclude=['products'])
-        w['products'] = products_with_id
-        warehouses_dict.append(w)
     result: BulkWriteResult = await model.Warehouse.bulk_operation(
         db,
-        [
-            InsertOne(model.Warehouse(**w, id=uuid4()).mongo())
-            for w in warehouses_dict
-        ],
+        [InsertOne(w.mongo()) for w in warehouses_db],
         **kwargs
     )
     if not result.acknowledged:
@@ -130,6 +226,8 @@ async def bulk_create_service(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail='DB error'
         )
+    if len(products_db) > 0:
+        await create_products_service(db, products_db, **kwargs)
     return result
 
 
@@ -155,10 +253,230 @@ async def bulk_update_service(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail='DB error'
         )
+    product_catalog.clear()
+    return result
+
+
+async def create_products_service(
+    db: DataBaseDep,
+    products: list[model.Product],
+    **kwargs: Any,
+) -> BulkWriteResult:
+    return await bulk_products_service(
+        db,
+        operations=[
+            BulkOperation(bulk_type='InsertOne', data=p.mongo())
+            for p in products
+        ],
+        **kwargs
+    )
+
+
+def product_update_operation(product: model.Product, changes: dict[str, Any]) -> BulkOperation | None:
+    """
+    Builds the update of the fields of a product that changed.
+
+    Only the fields whose value differs from the read product are set, so the
+    stock movements are never overwritten. A new quantity is only set while the
+    product still has the read quantity, so a delivery applied since the read
+    is not lost.
+
+    Parameters:
+    - product (Product): The product as it was read.
+    - changes (dict[str, Any]): The new value of the updated fields.
+
+    Returns:
+    BulkOperation | None: The UpdateOne operation, None if nothing changed.
+    """
+    data = {
+        field: value for field, value in changes.items()
+        if getattr(product, field) != value
+    }
+    if len(data) == 0:
+        return None
+    query = {'id': product.id}
+    if 'quantity' in data:
+        query['quantity'] = product.quantity
+    return BulkOperation(
+        bulk_type='UpdateOne',
+        data={'$set': data},
+        query=model.Product.prepare_query(query)
+    )
+
+
+async def update_products_service(
+    db: DataBaseDep,
+    operations: list[BulkOperation],
+    **kwargs: Any,
+) -> BulkWriteResult:
+    result = await bulk_products_service(db, operations=operations, **kwargs)
+    updates = sum(1 for o in operations if o.bulk_type == BulkTypes.UpdateOne)
+    if result.matched_count < updates:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail='The quantity of some products changed during the update, try again'
+        )
+    return result
+
+
+async def apply_stock_movements_service(
+    db: DataBaseDep,
+    movements: dict[UUID4, int],
+) -> list[model.StockMovementFailure]:
+    """
+    Applies stock movements to products with conditional $inc operations sent in
+    a single bulk_write.
+
+    A negative movement only applies when the product has at least that quantity
+    left, so concurrent deliveries cannot lose updates or leave negative stock.
+    Every applied movement tags the product with the movement id, so when some
+    lines fail the applied ones are found and reverted, keeping the movements
+    all-or-nothing.
+
+    Parameters:
+    - db (AsyncIOMotorDatabase): The database to perform the operation on.
+    - movements (dict[UUID4, int]): Quantity change by product id.
+
+    Returns:
+    list[StockMovementFailure]: The lines that could not be applied, empty if
+    every movement was applied.
+    """
+    movements = {
+        product_id: quantity for product_id, quantity in movements.items()
+        if quantity != 0
+    }
+    if len(movements) == 0:
+        return []
+    movement_id = uuid4()
+    operations = [
+        BulkOperation(
+            bulk_type='UpdateOne',
+            data={
+                '$inc': {'quantity': quantity},
+                '$push': {
+                    'stock_movements': {
+                        '$each': [movement_id],
+                        '$slice': -STOCK_MOVEMENTS_WINDOW
+                    }
+                }
+            },
+            query=model.Product.prepare_query(
+                {'id': product_id, 'quantity': {'$gte': -quantity}}
+                if quantity < 0 else {'id': product_id}
+            )
+        )
+        for product_id, quantity in movements.items()
+    ]
+    result = await _bulk_write_products(db, operations=operations, ordered=False)
+    if result.matched_count == len(operations):
+        return []
+    cursor = model.Product.get_collection(db).find(
+        {'_id': {'$in': list(movements)}},
+        {'quantity': 1, 'stock_movements': 1}
+    )
+    products = await cursor.to_list(length=None)
+    applied = [
+        p['_id'] for p in products
+        if movement_id in p.get('stock_movements', [])
+    ]
+    if len(applied) > 0:
+        await _bulk_write_products(
+            db,
+            operations=[
+                BulkOperation(
+                    bulk_type='UpdateOne',
+                    data={
+                        '$inc': {'quantity': -movements[product_id]},
+                        '$pull': {'stock_movements': movement_id}
+                    },
+                    query={'_id': product_id, 'stock_movements': movement_id}
+                )
+                for product_id in applied
+            ],
+            ordered=False
+        )
+    available = {
+        p['_id']: p['quantity'] - movements[p['_id']] if p['_id'] in applied else p['quantity']
+        for p in products
+    }
+    return [
+        model.StockMovementFailure(
+            product_id=product_id,
+            quantity=quantity,
+            available=available.get(product_id)
+        )
+        for product_id, quantity in movements.items()
+        if product_id not in applied
+    ]
+
+
+async def replace_warehouse_products_service(
+    db: DataBaseDep,
+    warehouse_id: UUID4,
+    products: list[model.WarehouseProduct],
+) -> BulkWriteResult:
+    old_products = await get_products_service(
+        db,
+        query={'id': {'$in': [p.id for p in products]}}
+    )
+    old_products_by_id = {p.id: p for p in old_products}
+    operations = [
+        BulkOperation(
+            bulk_type='DeleteMany',
+            data=None,
+            query={
+                'warehouse_id': warehouse_id,
+                '_id': {'$nin': [p.id for p in products]}
+            }
+        )
+    ]
+    for product in products:
+        old_product = old_products_by_id.get(product.id)
+        if old_product is None:
+            operations.append(BulkOperation(
+                bulk_type='InsertOne',
+                data=model.Product(**product.model_dump(), warehouse_id=warehouse_id).mongo()
+            ))
+            continue
+        operation = product_update_operation(
+            old_product,
+            dict(product.model_dump(exclude={'id'}), warehouse_id=warehouse_id)
+        )
+        if operation is not None:
+            operations.append(operation)
+    return await update_products_service(db, operations=operations)
+
+
+async def delete_product_service(db: DataBaseDep, product_id: UUID4) -> None:
+    mongo_delete: DeleteResultMongo = await model.Product.delete(db, query={'id': product_id})
+    if not mongo_delete.acknowledged:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail='DB error'
+        )
+    product_catalog.pop(product_id)
+
+
+async def bulk_products_service(db: DataBaseDep, operations: list[BulkOperation], **kwargs: Any):
+    result = await _bulk_write_products(db, operations, **kwargs)
+    product_catalog.clear()
     return result
 
 
-async def count_products_service(db: DataBaseDep, query: dict) -> int:
-    warehouses: list[model.Warehouse] = await model.Warehouse.get_multi(db, query)
-    count = sum(len(warehouse.products) for warehouse in warehouses)
-    return count
+async def _bulk_write_products(
+    db: DataBaseDep,
+    operations: list[BulkOperation],
+    **kwargs: Any
+) -> BulkWriteResult:
+    # Las operaciones de stock no cambian nombres, así que no invalidan la caché
+    result: BulkWriteResult = await model.Product.bulk_operation(
+        db,
+        [o.operation() for o in operations],
+        **kwargs
+    )
+    if not result.acknowledged:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail='DB error'
+        )
+    return result
@@ -8,7 +8,7 @@ from fastapi.security import OAuth2PasswordRequestForm
 
 from src.core.config import settings
 from src.core.deps import DataBaseDep
-from src.core.utils.security import create_access_token, create_refresh_token
+from src.core.utils.security import create_access_token, create_refresh_token, password_hasher
 from src.modules.shared.auth import service, model
 from src.modules.shared.user import model as user_model, service as user_service
 
@@ -112,9 +112,13 @@ async def get_secret_and_qr(db, email) -> model.UserSecretOut:
 
 
 async def is_master_controller(
-    user: user_model.User
+    user: user_model.UserPrincipal
 ) -> model.UserIsMaster:
     return model.UserIsMaster(
         id=user.id,
         is_master=user.master
     )
+
+
+async def password_hashing_stats_controller() -> model.PasswordHashingStats:
+    return model.PasswordHashingStats(**password_hasher.stats())
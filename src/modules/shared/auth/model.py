@@ -1,6 +1,7 @@
 from datetime import datetime, timezone
 import pytz
 from pydantic import BaseModel, UUID4, EmailStr
+from pymongo import ASCENDING, IndexModel
 
 from src.core.database.base_crud import BaseMongo
 
@@ -21,6 +22,8 @@ class UserAuth(BaseModel):
 
 
 class UserSecret(BaseMongo):
+    __indexes__ = [IndexModel([('email', ASCENDING)])]
+
     id: UUID4
     email: EmailStr
     user_secret: str
@@ -47,7 +50,21 @@ class UserIsMaster(BaseModel):
     is_master: bool
 
 
+class PasswordHashingStats(BaseModel):
+    workers: int
+    running: int
+    waiting: int
+    max_waiting: int
+    completed: int
+
+
 class RefreshToken(BaseMongo):
+    __indexes__ = [
+        IndexModel([('expires_at', ASCENDING)], expireAfterSeconds=0),
+        IndexModel([('refresh_token', ASCENDING)]),
+        IndexModel([('user_id', ASCENDING)]),
+    ]
+
     id: UUID4
     user_id: UUID4
     refresh_token: str
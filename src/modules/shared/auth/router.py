@@ -3,7 +3,7 @@ from typing import Annotated
 from fastapi import APIRouter, Depends, status
 from fastapi.security import OAuth2PasswordRequestForm
 
-from src.core.deps import DataBaseDep, get_current_user
+from src.core.deps import DataBaseDep, get_current_user, get_master_user
 from src.modules.shared.auth import controller, model
 from src.modules.shared.user import model as user_model
 
@@ -20,7 +20,7 @@ router = APIRouter(tags=['Authentication'])
     response_model=model.UserIsMaster
 )
 async def is_master(
-    user: Annotated[user_model.User, Depends(get_current_user)]
+    user: Annotated[user_model.UserPrincipal, Depends(get_current_user)]
 ):
     """
     Checks if the user is a master user.
@@ -28,6 +28,26 @@ async def is_master(
     return await controller.is_master_controller(user)
 
 
+@router.get(
+    '/password-hashing',
+    status_code=status.HTTP_200_OK,
+    response_model=model.PasswordHashingStats,
+    dependencies=[Depends(get_master_user)],
+    responses={
+        status.HTTP_200_OK: {'description': 'Successful Response'},
+        status.HTTP_403_FORBIDDEN: {'description': 'Not enough privileges'}
+    }
+)
+async def password_hashing_stats():
+    """
+    **Load of the password hashing pool.**
+
+    Returns how many bcrypt hashes or checks are running, how many are waiting
+    for a free worker, the longest queue seen and how many have completed.
+    """
+    return await controller.password_hashing_stats_controller()
+
+
 @router.post(
     '/login',
     status_code=status.HTTP_200_OK,
@@ -68,7 +88,7 @@ async def refresh_token(db: DataBaseDep, refresh_body: model.RefreshTokenBody):
                  200: {"description": "User secret and QR code generated successfully"},
                  400: {"description": "Email does not exist in the system"},
              })
-async def get_secret_and_qr(db: DataBaseDep, user: user_model.User = Depends(get_current_user)):
+async def get_secret_and_qr(db: DataBaseDep, user: user_model.UserPrincipal = Depends(get_current_user)):
     """
     Generates a new secret and QR code for a user, typically used for two-factor authentication
     setup.
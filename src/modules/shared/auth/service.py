@@ -5,7 +5,7 @@ from fastapi.security import OAuth2PasswordRequestForm
 
 from src.core.database.mongo_types import DeleteResultMongo, InsertOneResultMongo
 from src.core.deps import DataBaseDep
-from src.core.utils.security import verify_password
+from src.core.utils.security import password_hasher
 from src.modules.shared.auth import model
 from src.modules.shared.user import model as user_model
 
@@ -29,7 +29,7 @@ def verify_otp(secret, otp):
 async def login_service(db: DataBaseDep,
                         form_data: OAuth2PasswordRequestForm) -> user_model.User | None:
     user: user_model.User = await user_model.User.get(db, query={'username': form_data.username})
-    if not (user and verify_password(form_data.password, user.password)):
+    if not (user and await password_hasher.verify(form_data.password, user.password)):
         return None
     return user
 
@@ -5,20 +5,22 @@ import tempfile
 
 from fastapi import HTTPException, Response
 from fastapi.responses import JSONResponse
-from src.core.database.backup import BackupEncoder, dump_to_json, populate_from_json
+from src.core.config import settings
+from src.core.database.backup import dump_to_json, populate_from_json
+from src.core.database.codecs import migrate_string_datetimes
+from src.core.database.session import document_models
 from src.core.deps import DataBaseDep
 from src.core.utils.security import decrypt_data, derive_key, encrypt_data, generate_salt
+from src.modules.cyc.warehouse.cache import product_catalog
+from src.modules.cyc.warehouse.migration import migrate_embedded_products
+from src.modules.shared.user.cache import user_principals
 
 
 async def generate_backup_service(db: DataBaseDep, password: str):
-    data = await dump_to_json(db)
-
-    print("Data dumped")
-
     with tempfile.TemporaryDirectory() as tmp_dir:
         json_file_path = os.path.join(tmp_dir, "backup.json")
         with open(json_file_path, "w") as json_file:
-            json.dump(data, json_file, indent=4, cls=BackupEncoder)
+            await dump_to_json(db, json_file)
 
         print("Data dumped to JSON file")
 
@@ -80,5 +82,10 @@ async def restore_backup_service(db: DataBaseDep, password: str, file):
             restored_data = json.load(json_file)
 
         await populate_from_json(db, restored_data)
+        await migrate_string_datetimes(db, document_models())
+        user_principals.clear()
+        if settings.CYC_NGO:
+            await migrate_embedded_products(db)
+            product_catalog.clear()
 
     return {"message": "Data restored successfully"}
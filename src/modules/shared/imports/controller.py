@@ -0,0 +1,15 @@
+from fastapi import HTTPException, status
+from pydantic import UUID4
+
+from src.core.deps import DataBaseDep
+from src.modules.shared.imports import model, service
+
+
+async def get_import_job_controller(db: DataBaseDep, job_id: UUID4) -> model.ImportJob:
+    result = await service.get_import_job_service(db, {'id': job_id})
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail='Import job not found'
+        )
+    return result
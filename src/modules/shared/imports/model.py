@@ -0,0 +1,50 @@
+from enum import Enum
+from typing import Any, Optional
+
+from pydantic import BaseModel, UUID4, NonNegativeInt
+from pymongo import ASCENDING, IndexModel
+
+from src.core.config import settings
+from src.core.database.base_crud import BaseMongo
+from src.core.database.codecs import NaiveUTCDatetime
+
+
+class ImportStatus(Enum):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+
+
+class ImportRowError(BaseModel):
+    row: Optional[int] = None
+    detail: str
+
+
+class InvalidImportRow(Exception):
+    """
+    Raised by the importers when a row of the file cannot be imported. The
+    import job records the detail as an error of the row being processed.
+    """
+
+    def __init__(self, detail: Any) -> None:
+        super().__init__(detail)
+        self.detail = detail
+
+
+class ImportJob(BaseMongo):
+    __indexes__ = [
+        IndexModel(
+            [('created_at', ASCENDING)],
+            expireAfterSeconds=settings.IMPORT_JOB_TTL_SECONDS
+        ),
+    ]
+
+    id: UUID4
+    kind: str
+    filename: str
+    status: ImportStatus = ImportStatus.PENDING
+    created_at: NaiveUTCDatetime
+    finished_at: Optional[NaiveUTCDatetime] = None
+    processed_rows: NonNegativeInt = 0
+    errors: list[ImportRowError] = []
@@ -0,0 +1,28 @@
+from fastapi import APIRouter, status
+from pydantic import UUID4
+
+from src.core.deps import DataBaseDep
+from src.server import dependencies
+from src.modules.shared.imports import controller
+from src.modules.shared.imports import model
+
+router = APIRouter(tags=['Import'], dependencies=dependencies)
+
+
+@router.get('/{job_id}',
+            status_code=status.HTTP_200_OK,
+            response_model=model.ImportJob,
+            responses={
+                200: {"description": "Successful Response"},
+                404: {"description": "Import job not found"},
+                500: {"description": "Internal Server Error"}
+            })
+async def get_import_job(db: DataBaseDep, job_id: UUID4):
+    """
+    **Get the state of an Excel import.**
+
+    The Excel uploads return a job right away and import the file in the background.
+    This returns the job status (pending, running, completed or failed), the number of
+    rows already written and, when it failed, the errors with the row that caused them.
+    """
+    return await controller.get_import_job_controller(db, job_id)
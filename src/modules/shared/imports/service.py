@@ -0,0 +1,197 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, TypeVar
+
+from fastapi import HTTPException, UploadFile, status
+from pydantic import UUID4
+
+from src.core.config import settings
+from src.core.deps import DataBaseDep
+from src.core.database.base_crud import BulkOperation
+from src.modules.shared.imports import model
+
+# Referencias a las importaciones en curso para que no se recolecten
+_running_jobs: set[asyncio.Task] = set()
+_process_pool: ProcessPoolExecutor | None = None
+
+Row = TypeVar('Row')
+Validated = TypeVar('Validated')
+
+
+class ImportProgress():
+    """
+    Progress of a running import.
+
+    The parser updates `row` with the row it is reading, so a failure can point
+    at it, and every batch written adds to `processed_rows`. Importers that
+    validate every row before failing add the rejected rows to `errors`.
+    """
+
+    def __init__(self, db: DataBaseDep, job_id: UUID4) -> None:
+        self.db = db
+        self.job_id = job_id
+        self.row: int | None = None
+        self.processed_rows = 0
+        self.errors: list[model.ImportRowError] = []
+
+    async def add_processed_rows(self, rows: int) -> None:
+        self.processed_rows += rows
+        await model.ImportJob.update(
+            self.db,
+            {'id': self.job_id},
+            {'processed_rows': self.processed_rows}
+        )
+
+
+Importer = Callable[[DataBaseDep, bytes, ImportProgress], Awaitable[None]]
+
+
+async def get_import_job_service(db: DataBaseDep, query: dict) -> model.ImportJob | None:
+    return await model.ImportJob.get(db, query)
+
+
+async def create_import_job_service(
+    db: DataBaseDep,
+    kind: str,
+    file: UploadFile,
+    importer: Importer
+) -> model.ImportJob:
+    """
+    Registers an import job and runs it in the background.
+
+    Parameters:
+    - db (DataBaseDep): The database to import into.
+    - kind (str): What is being imported, e.g. "patients".
+    - file (UploadFile): The uploaded Excel file.
+    - importer (Importer): The coroutine that parses the file and writes its rows.
+
+    Returns:
+    model.ImportJob: The pending job.
+    """
+    content = await file.read()
+    result = await model.ImportJob.create(
+        db,
+        obj_to_create={
+            'kind': kind,
+            'filename': file.filename,
+            'created_at': datetime.now(timezone.utc)
+        }
+    )
+    if not result.acknowledged:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail='DB error'
+        )
+    task = asyncio.create_task(
+        run_import_job_service(db, result.inserted_id, content, importer)
+    )
+    _running_jobs.add(task)
+    task.add_done_callback(_running_jobs.discard)
+    return await get_import_job_service(db, {'id': result.inserted_id})
+
+
+async def run_import_job_service(
+    db: DataBaseDep,
+    job_id: UUID4,
+    content: bytes,
+    importer: Importer
+) -> None:
+    progress = ImportProgress(db, job_id)
+    await model.ImportJob.update(db, {'id': job_id}, {'status': model.ImportStatus.RUNNING})
+    errors = progress.errors
+    try:
+        await importer(db, content, progress)
+    except model.InvalidImportRow as e:
+        errors.append(model.ImportRowError(row=progress.row, detail=str(e.detail)))
+    except HTTPException as e:
+        # Errores de los servicios compartidos con la API, como un conflicto de stock
+        errors.append(model.ImportRowError(row=progress.row, detail=str(e.detail)))
+    except Exception as e:  # pylint: disable=W0718
+        errors.append(model.ImportRowError(row=progress.row, detail=f'Unexpected error: {e}'))
+    await model.ImportJob.update(
+        db,
+        {'id': job_id},
+        {
+            'status': model.ImportStatus.FAILED if len(errors) > 0 else model.ImportStatus.COMPLETED,
+            'errors': [error.model_dump() for error in errors],
+            'processed_rows': progress.processed_rows,
+            'finished_at': datetime.now(timezone.utc)
+        }
+    )
+
+
+async def write_in_batches(
+    progress: ImportProgress,
+    operations: list[BulkOperation],
+    bulk: Callable[[list[BulkOperation]], Awaitable[Any]],
+    count_rows: bool = True
+) -> None:
+    """
+    Writes the operations of an import IMPORT_BATCH_SIZE at a time.
+
+    Parameters:
+    - progress (ImportProgress): The progress of the import.
+    - operations (list[BulkOperation]): The operations to write.
+    - bulk (Callable): Writes one batch, e.g. a module's bulk service.
+    - count_rows (bool): Whether every operation stands for an imported row.
+    """
+    batch_size = settings.IMPORT_BATCH_SIZE
+    for start in range(0, len(operations), batch_size):
+        batch = operations[start:start + batch_size]
+        await bulk(batch)
+        if count_rows:
+            await progress.add_processed_rows(len(batch))
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool  # pylint: disable=W0603
+    # Si un proceso murió, el pool queda roto para siempre y hay que crear otro
+    if _process_pool is not None and _process_pool._broken:  # pylint: disable=W0212
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=settings.IMPORT_PROCESS_WORKERS)
+    return _process_pool
+
+
+def shutdown_process_pool() -> None:
+    global _process_pool  # pylint: disable=W0603
+    if _process_pool is not None:
+        _process_pool.shutdown(cancel_futures=True)
+        _process_pool = None
+
+
+async def validate_in_processes(
+    validate: Callable[[list[Row]], tuple[list[Validated], list[model.ImportRowError]]],
+    rows: list[Row]
+) -> tuple[list[Validated], list[model.ImportRowError]]:
+    """
+    Validates the rows of an import in chunks spread over a process pool.
+
+    Validating models is CPU bound, so threads would still run one at a time.
+    The rows and the results are pickled to and from the workers, so `validate`
+    must be a module level function and should return plain data, such as the
+    documents to insert.
+
+    Parameters:
+    - validate (Callable): Validates one chunk, returning the valid rows and the
+    errors of the invalid ones.
+    - rows (list): The rows read from the file.
+
+    Returns:
+    tuple[list, list[ImportRowError]]: The valid rows and the errors, both in
+    the order of the file.
+    """
+    loop = asyncio.get_running_loop()
+    chunk_size = settings.IMPORT_VALIDATION_CHUNK_SIZE
+    results = await asyncio.gather(*(
+        loop.run_in_executor(get_process_pool(), validate, rows[start:start + chunk_size])
+        for start in range(0, len(rows), chunk_size)
+    ))
+    validated: list[Validated] = []
+    errors: list[model.ImportRowError] = []
+    for chunk_validated, chunk_errors in results:
+        validated += chunk_validated
+        errors += chunk_errors
+    return validated, errors
@@ -0,0 +1,10 @@
+from src.core.config import settings
+from src.core.utils.cache import TTLCache
+
+# Id de usuario -> usuario, para no leerlo de la base de datos en cada petición
+# autenticada. Cada worker tiene su copia, el TTL limita cuánto puede tardar en
+# enterarse de un cambio hecho en otro worker
+user_principals = TTLCache(
+    maxsize=settings.USER_PRINCIPAL_CACHE_SIZE,
+    ttl=settings.USER_PRINCIPAL_CACHE_TTL_SECONDS
+)
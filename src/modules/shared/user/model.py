@@ -1,10 +1,16 @@
-from pydantic import EmailStr, BaseModel, UUID4
+from pydantic import EmailStr, BaseModel, ConfigDict, UUID4
 from typing import Optional
+from pymongo import ASCENDING, IndexModel
 
 from src.core.database.base_crud import BaseMongo
 
 
 class User(BaseMongo):
+    __indexes__ = [
+        IndexModel([('username', ASCENDING)], unique=True),
+        IndexModel([('email', ASCENDING)], unique=True),
+    ]
+
     id: UUID4
     master: bool = False
     username: str
@@ -24,6 +30,13 @@ class UserOut(BaseModel):
     email: EmailStr
 
 
+class UserPrincipal(UserOut):
+    # Usuario autenticado, se comparte entre peticiones desde la caché
+    model_config = ConfigDict(frozen=True)
+
+    master: bool = False
+
+
 class UserUpdate(BaseModel):
     username: Optional[str] = None
     password: Optional[str] = None
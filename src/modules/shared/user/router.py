@@ -71,7 +71,7 @@ async def get_users(db: DataBaseDep):
         200: {"description": "User information retrieved successfully"},
     }
 )
-async def get_me(user: Annotated[model.User, Depends(get_current_user)]):
+async def get_me(user: Annotated[model.UserPrincipal, Depends(get_current_user)]):
     return user
 
 
@@ -1,10 +1,12 @@
 from fastapi import HTTPException, status
 from pydantic import UUID4
+from pymongo.errors import DuplicateKeyError
 
 from src.core.deps import DataBaseDep
-from src.core.utils.security import get_hashed_password
+from src.core.utils.security import password_hasher
 from src.core.database.mongo_types import InsertOneResultMongo, DeleteResultMongo
 from src.modules.shared.user import model
+from src.modules.shared.user.cache import user_principals
 
 
 async def get_users_service(db: DataBaseDep, query: dict = None) -> list[model.User]:
@@ -28,9 +30,12 @@ async def create_user_service(db: DataBaseDep, user: dict) -> model.UserOut | No
     )
     if len(user_check) > 0:
         return None
-    hashed_password = get_hashed_password(user['password'])
+    hashed_password = await password_hasher.hash(user['password'])
     user['password'] = hashed_password
-    insert_mongo: InsertOneResultMongo = await model.User.create(db, user)
+    try:
+        insert_mongo: InsertOneResultMongo = await model.User.create(db, user)
+    except DuplicateKeyError:
+        return None
     if not insert_mongo.acknowledged:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -56,7 +61,7 @@ async def update_user_service(
         return "Error 400"
 
     if user.password:
-        hashed_password = get_hashed_password(user.password)
+        hashed_password = await password_hasher.hash(user.password)
         user.password = hashed_password
 
     data_to_update = user.model_dump()
@@ -64,11 +69,20 @@ async def update_user_service(
         if data_to_update[key] is None:
             data_to_update.pop(key)
 
-    user_db: model.User | None = await model.User.update(
-        db, query, data_to_update=data_to_update
-    )
+    # Se invalida antes y después de escribir, para que una petición que lea el
+    # usuario durante la escritura no deje en la caché la versión anterior
+    user_id = query.get('id')
+    if user_id is not None:
+        user_principals.pop(user_id)
+    try:
+        user_db: model.User | None = await model.User.update(
+            db, query, data_to_update=data_to_update
+        )
+    except DuplicateKeyError:
+        return "Error 400"
     if user_db is None:
         return "Error 404"
+    user_principals.pop(user_db.id)
 
     result = model.UserOut(
         id=user_db.id,
@@ -80,6 +94,7 @@ async def update_user_service(
 
 async def delete_user_service(db: DataBaseDep, user_id: UUID4) -> None:
     mongo_delete: DeleteResultMongo = await model.User.delete(db, query={'id': user_id})
+    user_principals.pop(user_id)
 
     if mongo_delete.deleted_count == 0:
         raise HTTPException(
@@ -110,6 +125,8 @@ async def find_username_by_email(db: DataBaseDep, email: str) -> str:
 
 
 async def change_password_service(db: DataBaseDep, email: str, new_password: str) -> dict:
-    hashed_password = get_hashed_password(new_password)
-    await model.User.update(db, {'email': email}, {'password': hashed_password})
+    hashed_password = await password_hasher.hash(new_password)
+    user_db = await model.User.update(db, {'email': email}, {'password': hashed_password})
+    if user_db is not None:
+        user_principals.pop(user_db.id)
     return {'detail': 'Your password has been changed successfully.'}
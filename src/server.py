@@ -5,6 +5,7 @@ from src.core.utils.dynamic_router import Routers
 from src.core.config import settings
 from src.core.database.session import connect_and_init_db, close_db_connection
 from src.core.deps import get_current_user
+from src.modules.shared.imports.service import shutdown_process_pool
 from src.modules.shared.shared import router_urls as core_urls
 
 
@@ -25,6 +26,7 @@ app = FastAPI(**settings.fastapi_kwargs)
 
 app.add_event_handler('startup', connect_and_init_db)
 app.add_event_handler('shutdown', close_db_connection)
+app.add_event_handler('shutdown', shutdown_process_pool)
 
 if settings.BACKEND_CORS_ORIGINS:
     app.add_middleware(
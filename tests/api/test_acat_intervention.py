@@ -63,6 +63,7 @@ async def insert_interventions_mongo(mongo_db: Database):
         mongo_db['Intervention'].insert_one(intervention)
         result.append(intervention)
     yield result
+    mongo_db['Patient'].delete_one({'_id': patient['id']})
 
 
 @pytest_asyncio.fixture()
@@ -85,6 +86,7 @@ async def insert_patient_mongo(mongo_db: Database):
     }
     mongo_db['Patient'].insert_one(patient)
     yield patient
+    mongo_db['Patient'].delete_one({'_id': patient['_id']})
 
 
 def test_get_intervention_detail(
@@ -1,3 +1,5 @@
+import json
+import time
 from pathlib import Path
 import openpyxl
 from uuid import uuid4
@@ -46,7 +48,7 @@ async def insert_patients_mongo(mongo_db: Database):
             "address": "Calle 1",
             "contact_phone": "123123123",
             "alias": generate_alias('Paciente 2', 'AAA', 'BBB'),
-            "nid": "12343456M",
+            "nid": "12343457R",
             "birth_date": "2023-02-28",
             "gender": "Man",
             "address": "Calle 1",
@@ -151,6 +153,61 @@ def test_get_patients(
         assert item["nid"] == patient["nid"]
 
 
+def test_get_patients_filtered_count(
+        app_client: TestClient,
+        insert_patients_mongo,
+        app_superuser):
+    access_token = app_superuser['access_token']
+    headers = {'authorization': f'Bearer {access_token}'}
+    params = {'nid': insert_patients_mongo[1]['nid']}
+    response = app_client.get(url=URL_PATIENT, headers=headers, params=params)
+    assert response.status_code == 200
+    result = response.json()
+    assert result['total_elements'] == 1
+    assert result['elements'][0]['id'] == str(insert_patients_mongo[1]['_id'])
+    params = {'estimated_count': True, 'limit': 1}
+    response = app_client.get(url=URL_PATIENT, headers=headers, params=params)
+    assert response.status_code == 200
+    result = response.json()
+    assert len(result['elements']) == 1
+    assert result['total_elements'] == len(insert_patients_mongo)
+
+
+def test_get_patients_fields(
+        app_client: TestClient,
+        insert_patients_mongo,
+        app_superuser):
+    access_token = app_superuser['access_token']
+    headers = {'authorization': f'Bearer {access_token}'}
+    params = {'fields': 'name,nid', 'nid': insert_patients_mongo[0]['nid']}
+    response = app_client.get(url=URL_PATIENT, headers=headers, params=params)
+    assert response.status_code == 200
+    result = response.json()
+    assert result['total_elements'] == 1
+    assert result['elements'] == [{
+        'id': str(insert_patients_mongo[0]['_id']),
+        'name': insert_patients_mongo[0]['name'],
+        'nid': insert_patients_mongo[0]['nid'],
+    }]
+    params = {'fields': 'name,password'}
+    response = app_client.get(url=URL_PATIENT, headers=headers, params=params)
+    assert response.status_code == 400
+
+
+def test_get_patients_ndjson(
+        app_client: TestClient,
+        insert_patients_mongo,
+        app_superuser):
+    access_token = app_superuser['access_token']
+    headers = {'authorization': f'Bearer {access_token}'}
+    params = {'format': 'ndjson', 'fields': 'nid'}
+    response = app_client.get(url=URL_PATIENT, headers=headers, params=params)
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('application/x-ndjson')
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(row['nid'] for row in rows) == sorted(p['nid'] for p in insert_patients_mongo)
+
+
 def test_upload_excel_patients(
         app_client: TestClient,
         mongo_db: Database,
@@ -173,8 +230,18 @@ def test_upload_excel_patients(
                 "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")}
         response = app_client.post(url=url, files=files, headers=headers)
 
-    # Verificar que la respuesta sea exitosa
-    assert response.status_code == 204
+    # Verificar que la importacion se haya aceptado y esperar a que termine
+    assert response.status_code == 202
+    job = response.json()
+    for _ in range(50):
+        if job['status'] not in ('pending', 'running'):
+            break
+        time.sleep(0.1)
+        job = app_client.get(
+            url=f"{settings.API_STR}shared/imports/{job['id']}", headers=headers
+        ).json()
+    assert job['status'] == 'completed'
+    assert job['errors'] == []
 
     # Cargar el archivo Excel en meoria
     wb = openpyxl.load_workbook(excel_file_path)
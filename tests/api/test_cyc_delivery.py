@@ -55,7 +55,17 @@ async def insert_deliveries_mongo(mongo_db: Database):
         ]
     }
 
-    mongo_db['Warehouse'].insert_one(warehouse)
+    mongo_db['Warehouse'].insert_one(
+        {"_id": warehouse["_id"], "name": warehouse["name"]}
+    )
+    product = warehouse["products"][0]
+    mongo_db['Product'].insert_one({
+        "_id": product["id"],
+        "name": product["name"],
+        "quantity": product["quantity"],
+        "exp_date": product["exp_date"],
+        "warehouse_id": warehouse["_id"],
+    })
 
     deliveries = [
         {
@@ -92,6 +102,7 @@ async def insert_deliveries_mongo(mongo_db: Database):
         mongo_db['Delivery'].insert_one(delivery)
         result.append(delivery)
     yield result
+    mongo_db['Warehouse'].delete_one({'_id': warehouse['_id']})
 
 
 def test_get_deliveries(
@@ -119,6 +130,50 @@ def test_get_deliveries(
         assert item['family_id'] == str(delivery['family_id'])
 
 
+def test_get_deliveries_filtered_by_date_window(
+        app_client: TestClient,
+        insert_deliveries_mongo,
+        app_superuser):
+    access_token = app_superuser['access_token']
+    headers = {'authorization': f'Bearer {access_token}'}
+    params = {
+        'family': str(insert_deliveries_mongo[0]['family_id']),
+        'after_date': '2025-03-01',
+        'before_date': '2025-03-31'
+    }
+    response = app_client.get(url=URL_DELIVERY, headers=headers, params=params)
+    assert response.status_code == 200
+    assert len(response.json()['elements']) == 2
+    params['before_date'] = '2025-03-07'
+    response = app_client.get(url=URL_DELIVERY, headers=headers, params=params)
+    assert response.status_code == 200
+    assert len(response.json()['elements']) == 0
+
+
+def test_get_deliveries_with_cursor(
+        app_client: TestClient,
+        insert_deliveries_mongo,
+        app_superuser):
+    access_token = app_superuser['access_token']
+    headers = {'authorization': f'Bearer {access_token}'}
+    family_id = str(insert_deliveries_mongo[0]['family_id'])
+    params = {'family': family_id, 'limit': 1, 'cursor': ''}
+    seen = []
+    while True:
+        response = app_client.get(url=URL_DELIVERY, headers=headers, params=params)
+        assert response.status_code == 200
+        result = response.json()
+        assert result['total_elements'] == 2
+        seen += [item['id'] for item in result['elements']]
+        if result['next_cursor'] is None:
+            break
+        params['cursor'] = result['next_cursor']
+    assert sorted(seen) == sorted(str(d['_id']) for d in insert_deliveries_mongo)
+    params['cursor'] = 'invalid'
+    response = app_client.get(url=URL_DELIVERY, headers=headers, params=params)
+    assert response.status_code == 400
+
+
 def test_get_delivery_detail(
     app_client: TestClient,
     insert_deliveries_mongo,
@@ -142,6 +197,34 @@ def test_get_delivery_detail(
         insert_deliveries_mongo[0]["family_id"])
 
 
+def test_get_delivery_detail_after_warehouse_rename(
+    app_client: TestClient,
+    insert_deliveries_mongo,
+    app_superuser,
+    mongo_db: Database
+):
+    access_token = app_superuser['access_token']
+    headers = {'authorization': f'Bearer {access_token}'}
+    delivery_id = str(insert_deliveries_mongo[0]["_id"])
+    url = f'{URL_DELIVERY}/{delivery_id}'
+    response = app_client.get(url=url, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["lines"][0]["warehouse"] == "Warehouse"
+    product = mongo_db['Product'].find_one(
+        {'_id': insert_deliveries_mongo[0]["lines"][0]["product_id"]}
+    )
+    url_warehouse = f'{settings.API_STR}cyc/warehouse/{product["warehouse_id"]}'
+    response = app_client.patch(
+        url=url_warehouse,
+        headers=headers,
+        json={'name': 'Warehouse renamed'}
+    )
+    assert response.status_code == 200
+    response = app_client.get(url=url, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["lines"][0]["warehouse"] == "Warehouse renamed"
+
+
 def test_create_delivery(
         app_client: TestClient,
         insert_deliveries_mongo,
@@ -184,7 +267,16 @@ def test_get_family_deliveries(
     response = app_client.get(url=url, headers=headers)
     assert response.status_code == 200
     result = response.json()
-    assert len(result) == 2
+    assert result['total_elements'] == 2
+    assert len(result['elements']) == 2
+    for item in result['elements']:
+        assert item['family_id'] == family_id
+    response = app_client.get(url=url, headers=headers, params={'limit': 1, 'offset': 1})
+    assert response.status_code == 200
+    result = response.json()
+    assert result['total_elements'] == 2
+    assert len(result['elements']) == 1
+    assert result['elements'][0]['id'] == str(insert_deliveries_mongo[1]['_id'])
 
 
 def test_update_delivery(
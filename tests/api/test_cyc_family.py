@@ -115,6 +115,38 @@ def test_create_family(app_client: TestClient, app_superuser):
     assert response_data["address"] == family_data["address"]
 
 
+def test_create_family_duplicated_nid(
+        app_client: TestClient,
+        insert_families_mongo,
+        app_superuser):
+    access_token = app_superuser['access_token']
+    headers = {'authorization': f'Bearer {access_token}'}
+    url = f'{settings.API_STR}cyc/family/'
+    family_data = {
+        "name": "Familia Repetida",
+        "phone": "123456789",
+        "address": "456 Main St",
+        "members": [
+            {
+                "date_birth": "1985-08-25",
+                "type": "Adult",
+                "name": "Pepe",
+                "surname": "Cast",
+                "nationality": "Spain",
+                "nid": insert_families_mongo[0]['members'][0]['nid'],
+                "family_head": True,
+                "gender": "Man",
+                "functional_diversity": False,
+                "food_intolerances": [],
+                "homeless": False
+            }
+        ]
+    }
+    response = app_client.post(url=url, json=family_data, headers=headers)
+    assert response.status_code == 400
+    assert insert_families_mongo[0]['members'][0]['nid'] in response.json()['detail']
+
+
 def test_get_family_details(
         app_client: TestClient,
         insert_families_mongo,
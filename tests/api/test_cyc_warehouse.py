@@ -1,3 +1,4 @@
+import time
 from pathlib import Path
 from uuid import uuid4
 
@@ -47,8 +48,19 @@ async def insert_warehouses_with_products(mongo_db: Database):
             "products": []
          }
     ]
+    mongo_db['Product'].delete_many({})
     for warehouse in warehouses:
-        mongo_db['Warehouse'].insert_one(warehouse)
+        mongo_db['Warehouse'].insert_one(
+            {"_id": warehouse["_id"], "name": warehouse["name"]}
+        )
+        for product in warehouse["products"]:
+            mongo_db['Product'].insert_one({
+                "_id": product["id"],
+                "name": product["name"],
+                "quantity": product["quantity"],
+                "exp_date": product["exp_date"],
+                "warehouse_id": warehouse["_id"],
+            })
 
     yield warehouses
 
@@ -74,6 +86,33 @@ def test_get_all_products_list(
                    == product["quantity"] for product in inserted_products)
 
 
+def test_get_products_filtered(
+    app_client: TestClient,
+    insert_warehouses_with_products,
+    app_superuser
+):
+    access_token = app_superuser['access_token']
+    headers = {'authorization': f'Bearer {access_token}'}
+    warehouse = insert_warehouses_with_products[1]
+    url = f'{URL_WAREHOUSE}/product'
+    params = {
+        'name': 'Producto',
+        'warehouse': str(warehouse['_id']),
+        'after_exp_date': '2024-12-31',
+        'limit': 1
+    }
+    response: Response = app_client.get(url=url, headers=headers, params=params)
+    assert response.status_code == 200
+    result = response.json()
+    assert result['total_elements'] == 1
+    assert len(result['elements']) == 1
+    assert result['elements'][0]['id'] == str(warehouse['products'][0]['id'])
+    params = {'before_exp_date': '2024-12-31'}
+    response: Response = app_client.get(url=url, headers=headers, params=params)
+    assert response.status_code == 200
+    assert response.json() == {'elements': [], 'total_elements': 0}
+
+
 def test_get_product(
     app_client: TestClient,
     insert_warehouses_with_products,
@@ -93,6 +132,18 @@ def test_get_product(
     assert 'warehouse_id' in result
 
 
+def test_get_product_not_found(
+    app_client: TestClient,
+    insert_warehouses_with_products,
+    app_superuser
+):
+    access_token = app_superuser['access_token']
+    headers = {'authorization': f'Bearer {access_token}'}
+    url = f"{URL_WAREHOUSE}/product/{uuid4()}"
+    response: Response = app_client.get(url=url, headers=headers)
+    assert response.status_code == 404
+
+
 def test_create_product(
     app_client: TestClient,
     insert_warehouses_with_products,
@@ -158,16 +209,28 @@ def test_upload_excel_products(
                 "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")}
         response: Response = app_client.post(
             url=url, files=files, headers=headers)
-    # Verify response
-    assert response.status_code == 204
+    # Verify the import was accepted and wait for it to finish
+    assert response.status_code == 202
+    job = response.json()
+    for _ in range(50):
+        if job['status'] not in ('pending', 'running'):
+            break
+        time.sleep(0.1)
+        job = app_client.get(
+            url=f"{settings.API_STR}shared/imports/{job['id']}", headers=headers
+        ).json()
+    assert job['status'] == 'completed'
+    assert job['processed_rows'] > 0
     # Load excel file in memory
     wb = openpyxl.load_workbook(excel_file_path)
     ws = wb.active
     # Get db data
     warehouse_db = mongo_db["Warehouse"].find_one(
         {"name": ws.cell(row=2, column=4).value})
-    products_db = list(warehouse_db["products"])
-    first_product = products_db[0]
+    first_product = mongo_db["Product"].find_one({
+        "warehouse_id": warehouse_db["_id"],
+        "name": ws.cell(row=2, column=1).value
+    })
     # Compare db data with excel data
     assert first_product['name'] == ws.cell(row=2, column=1).value
     assert first_product['quantity'] == ws.cell(row=2, column=2).value
@@ -98,3 +98,18 @@ def test_is_master(app_client: TestClient, login_user):
     assert response.status_code == 200
     result = response.json()
     assert result['is_master'] == False
+
+
+def test_password_hashing_stats(app_client: TestClient, login_user, app_superuser):
+    url = f'{URL_AUTH}password-hashing'
+    headers = {'Authorization': f"Bearer {login_user['access_token']}"}
+    response: Response = app_client.get(url=url, headers=headers)
+    assert response.status_code == 403
+    headers = {'Authorization': f"Bearer {app_superuser['access_token']}"}
+    response = app_client.get(url=url, headers=headers)
+    assert response.status_code == 200
+    result = response.json()
+    assert result['workers'] == settings.PASSWORD_HASHING_WORKERS
+    # El login del usuario ya ha pasado por el pool
+    assert result['completed'] > 0
+    assert result['waiting'] == 0
@@ -0,0 +1,14 @@
+from uuid import uuid4
+
+from fastapi.testclient import TestClient
+
+from src.core.config import settings
+
+URL_IMPORTS = f'{settings.API_STR}shared/imports'
+
+
+def test_get_import_job_not_found(app_client: TestClient, app_superuser):
+    access_token = app_superuser['access_token']
+    headers = {'authorization': f'Bearer {access_token}'}
+    response = app_client.get(url=f'{URL_IMPORTS}/{uuid4()}', headers=headers)
+    assert response.status_code == 404
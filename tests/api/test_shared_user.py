@@ -20,6 +20,7 @@ async def insert_user_mongo(mongo_db: Database):
     }
     mongo_db["User"].insert_one(user)
     yield user
+    mongo_db["User"].delete_one({'_id': user['_id']})
 
 
 def test_get_all_user(
@@ -0,0 +1,83 @@
+"""
+Micro-benchmark of check_nid against the implementation it replaced.
+
+Not collected by pytest, run it with:
+
+    python -m tests.benchmarks.bench_check_nid
+"""
+import re
+import timeit
+
+from src.core.utils.validators import NID_LETTERS, check_nid
+
+ROUNDS = 5
+CALLS = 20_000
+
+
+def check_nid_previous(data: str):
+    nif_pattern = re.compile('^[0-9]{8}[TRWAGMYFPDXBNJZSQVHLCKE]$')
+    nie_pattern = re.compile('^[XYZ][0-9]{7}[TRWAGMYFPDXBNJZSQVHLCKE]$')
+    if not nif_pattern.match(data) and not nie_pattern.match(data):
+        return False
+    nie = re.sub(
+        '^[X]', '0',
+        re.sub('^[Y]', '1', re.sub('^[Z]', '2', data))
+    )
+    mod = int(nie[:8]) % 23
+    if data[-1] != NID_LETTERS[mod]:
+        return False
+    return True
+
+
+def sample_nids(size: int) -> list[str]:
+    # Un tercio de DNI, un tercio de NIE y un tercio con la letra mal
+    nids = []
+    for i in range(size):
+        number = (10_000_000 + i * 7919) % 100_000_000
+        if i % 3 == 0:
+            nids.append(f'{number:08d}{NID_LETTERS[number % 23]}')
+        elif i % 3 == 1:
+            prefix = (i // 3) % 3
+            number = number % 10_000_000
+            control = NID_LETTERS[(prefix * 10_000_000 + number) % 23]
+            nids.append(f'{"XYZ"[prefix]}{number:07d}{control}')
+        else:
+            nids.append(f'{number:08d}{NID_LETTERS[(number + 1) % 23]}')
+    return nids
+
+
+def best_per_call(func, nids: list[str]) -> float:
+    def run():
+        for nid in nids:
+            func(nid)
+    return min(timeit.repeat(run, number=1, repeat=ROUNDS)) / len(nids)
+
+
+def main():
+    unique = sample_nids(CALLS)
+    assert {nid[0] for nid in unique} >= set('XYZ')
+    # Una familia de 4 miembros repetida en muchas filas del excel
+    repeated = sample_nids(4) * (CALLS // 4)
+    for nid in unique:
+        expected = check_nid_previous(nid)
+        assert check_nid.__wrapped__(nid) == expected, nid
+        assert check_nid(nid) == expected, nid
+    cases = [
+        ('previous', check_nid_previous, unique),
+        ('compiled, no cache', check_nid.__wrapped__, unique),
+        ('cached, repeated NIDs', check_nid, repeated),
+    ]
+    timings = {}
+    for name, func, nids in cases:
+        check_nid.cache_clear()
+        timings[name] = best_per_call(func, nids)
+        print(
+            f'{name:<24}{timings[name] * 1e9:>10.0f} ns/call'
+            f'{timings["previous"] / timings[name]:>8.1f}x'
+        )
+    assert timings['compiled, no cache'] < timings['previous']
+    assert timings['cached, repeated NIDs'] < timings['previous']
+
+
+if __name__ == '__main__':
+    main()